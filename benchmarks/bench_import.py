@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# Licensed under the terms of the MIT License
+# (see LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""
+Measure the cold start of the ciocheck command line.
+
+Usage: python benchmarks/bench_import.py [runs]
+"""
+
+from __future__ import absolute_import, print_function
+
+# Standard library imports
+import subprocess
+import sys
+import time
+
+
+def cold_start(code, runs):
+    """Return the median time in seconds to run `code` in a new python."""
+    times = []
+    for _ in range(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code])
+        times.append(time.time() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    """Print the cold start time of the interpreter and of the CLI."""
+    runs = int(sys.argv[1]) if sys.argv[1:] else 10
+    python = cold_start('pass', runs)
+    ciocheck = cold_start('import ciocheck.main', runs)
+    print('Python interpreter: {0:.1f} ms'.format(1000 * python))
+    print('Import ciocheck.main: {0:.1f} ms (+{1:.1f} ms)'.format(
+        1000 * ciocheck, 1000 * (ciocheck - python)))
+
+
+if __name__ == '__main__':
+    main()
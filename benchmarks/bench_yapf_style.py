@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# Licensed under the terms of the MIT License
+# (see LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""
+Compare per file yapf overhead with and without a preloaded style.
+
+Usage: python benchmarks/bench_yapf_style.py [files]
+"""
+
+from __future__ import absolute_import, print_function
+
+# Standard library imports
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+# Third party imports
+from yapf.yapflib.yapf_api import FormatCode
+
+# Local imports
+from ciocheck.formatters import YapfFormatter
+
+# The first style equals the predefined pep8 style, so it is passed to yapf
+# by name, the second one is only resolved once
+STYLES = [
+    ('predefined', """[style]
+based_on_style = pep8
+column_limit = 79
+"""),
+    ('custom', """[style]
+based_on_style = pep8
+column_limit = 100
+spaces_before_comment = 4
+"""),
+]
+SOURCE = """def function( a,b ):
+    return [a, b]
+"""
+
+
+def bench_style(style, files):
+    """Return the seconds per file of both approaches with style."""
+    cmd_root = tempfile.mkdtemp()
+    try:
+        style_config = os.path.join(cmd_root, YapfFormatter.config_file)
+        with open(style_config, 'w') as file_obj:
+            file_obj.write(style)
+        YapfFormatter.cmd_root = cmd_root
+
+        before = timeit.timeit(
+            lambda: FormatCode(SOURCE, style_config=style_config),
+            number=files)
+        after = timeit.timeit(
+            lambda: YapfFormatter.format_string(SOURCE), number=files)
+    finally:
+        shutil.rmtree(cmd_root)
+    return before / files, after / files
+
+
+def main():
+    """Print the mean time per file of both approaches for each style."""
+    files = int(sys.argv[1]) if sys.argv[1:] else 200
+    for name, style in STYLES:
+        before, after = bench_style(style, files)
+        print('{0} style'.format(name.capitalize()))
+        print('  Style file parsed per file: {0:.3f} ms/file'.format(
+            1000 * before))
+        print('  Style preloaded per worker: {0:.3f} ms/file'.format(
+            1000 * after))
+
+
+if __name__ == '__main__':
+    main()
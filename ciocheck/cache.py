@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# Licensed under the terms of the MIT License
+# (see LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""On disk cache of tool results keyed by file content."""
+
+from __future__ import absolute_import, print_function
+
+# Standard library imports
+import hashlib
+import json
+import os
+
+# Local imports
+from ciocheck import __version__
+from ciocheck.config import CACHE_FOLDER
+from ciocheck.utils import FILE_CONTENTS, atomic_replace
+
+VERSIONS = {}
+
+
+def get_version(package):
+    """Return the installed version of `package` or an empty string."""
+    if package not in VERSIONS:
+        version = ''
+        try:
+            from importlib import metadata
+            version = metadata.version(package)
+        except Exception:
+            try:
+                import pkg_resources
+                version = pkg_resources.get_distribution(package).version
+            except Exception:
+                pass
+        VERSIONS[package] = version
+    return VERSIONS[package]
+
+
+class ResultCache(object):
+    """
+    On disk cache of tool results keyed by file content.
+
+    Keys combine the file path and content with the tool name, the tool
+    version and the contents of the config file generated for the tool from
+    its `.ciocheck` sections, so any change in those invalidates the entry.
+    """
+
+    def __init__(self, cmd_root, folder=CACHE_FOLDER):
+        """On disk cache of tool results keyed by file content."""
+        self.cmd_root = cmd_root
+        self.path = os.path.join(cmd_root, folder)
+        self._signatures = {}
+
+    def clear(self):
+        """Forget tool versions and configs, read again on the next key."""
+        self._signatures = {}
+        VERSIONS.clear()
+
+    def _signature(self, tool):
+        """Return the hashable identity of a tool and its configuration."""
+        if tool.name not in self._signatures:
+            config = b''
+            if tool.config_file:
+                config_path = os.path.join(self.cmd_root, tool.config_file)
+                if os.path.isfile(config_path):
+                    with open(config_path, 'rb') as file_obj:
+                        config = file_obj.read()
+            parts = [__version__, tool.name, get_version(tool.name)]
+            signature = '\x00'.join(parts).encode('utf-8') + b'\x00' + config
+            self._signatures[tool.name] = signature
+        return self._signatures[tool.name]
+
+    def _entry_path(self, key):
+        """Return the path of the file storing results for `key`."""
+        return os.path.join(self.path, key[:2], key + '.json')
+
+    def key(self, tool, path, contents=None):
+        """
+        Return the cache key of `path` for `tool`, None if unreadable.
+
+        If given, in memory `contents` are used instead of the file on disk.
+        """
+        if contents is not None:
+            contents = contents.encode('utf-8')
+        else:
+            try:
+                contents = FILE_CONTENTS.read_bytes(path)
+            except (IOError, OSError):
+                return None
+
+        sha = hashlib.sha1(self._signature(tool))
+        sha.update(b'\x00' + os.path.abspath(path).encode('utf-8') + b'\x00')
+        sha.update(contents)
+        return sha.hexdigest()
+
+    def get(self, key):
+        """Return stored results for `key` or None if not cached."""
+        if key is None:
+            return None
+
+        try:
+            with open(self._entry_path(key), 'r') as file_obj:
+                return json.load(file_obj)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def set(self, key, results):
+        """Store `results` for `key`."""
+        if key is None:
+            return
+
+        entry_path = self._entry_path(key)
+        folder = os.path.dirname(entry_path)
+        try:
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            atomic_replace(entry_path, json.dumps(results), 'utf-8')
+        except (IOError, OSError) as err:
+            print('Could not write cache entry: {0}'.format(err))
@@ -30,6 +30,8 @@ DEFAULT_IGNORE_FOLDERS = ('build', '__pychache__')
 MAIN_CONFIG_SECTION = 'ciocheck'
 CONFIGURATION_FILE = '.ciocheck'
 COVERAGE_CONFIGURATION_FILE = '.coveragerc'
+CACHE_FOLDER = '.ciocheck_cache'
+SOCKET_FILE = '.ciocheck.sock'
 
 COPYRIGHT_HEADER_FILE = '.ciocopyright'
 
@@ -48,6 +50,13 @@ DEFAULT_CIOCHECK_CONFIG = {
     'branch': DEFAULT_BRANCH,
     'diff_mode': STAGED_MODE,
     'file_mode': MODIFIED_LINES,
+    'vcs_file_listing': True,
+    'cache': False,
+    'parallel_linters': False,
+    'shard_linters': ['pep8', 'pydocstyle', 'flake8'],
+    'inprocess_linters': False,  # Lint through python apis on the workers
+    'max_processes': '',  # Defaults to the cpu count
+    'process_timeout': '',  # In seconds, defaults to no timeout
     # Python specific/ pyformat
     'header': DEFAULT_ENCODING_HEADER,
     'copyright_file': COPYRIGHT_HEADER_FILE,
@@ -95,15 +104,38 @@ class CustomConfigParser(configparser.ConfigParser):
             val = 'true' if value else 'false'
             self.set(self.SECTION, option, val)
         elif isinstance(default_value, list):
-            if default_value:
-                val = ','.join(value)
-            else:
-                val = ''
+            val = ','.join(value)
             self.set(self.SECTION, option, val)
         else:
             self.set(self.SECTION, option, value)
 
 
+def create_tool_config(folder, config, config_file, config_sections):
+    """
+    Write the config file of a tool from sections of the ciocheck config.
+
+    config_sections holds ('ciocheck:section', 'section') pairs.
+    """
+    new_config = configparser.ConfigParser()
+    for (cio_config_section, config_section) in config_sections:
+        if config.has_section(cio_config_section):
+            items = config.items(cio_config_section)
+            new_config.add_section(config_section)
+
+            for option, value in items:
+                new_config.set(config_section, option, value)
+
+    with open(os.path.join(folder, config_file), 'w') as file_obj:
+        new_config.write(file_obj)
+
+
+def remove_tool_config(folder, config_file):
+    """Remove the config file of a tool, if created."""
+    remove_file = os.path.join(folder, config_file)
+    if os.path.isfile(remove_file):
+        os.remove(remove_file)
+
+
 def load_file_config(folder, file_name=None):
     """
     Load configuration at `folder` or `file_name` and return the parser.
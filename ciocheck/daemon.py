@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# Licensed under the terms of the MIT License
+# (see LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Long running ciocheck server on a local socket and its thin client."""
+
+from __future__ import absolute_import, print_function
+
+# Standard library imports
+import json
+import os
+import socket
+import sys
+
+# Third party imports
+from six.moves import cStringIO as StringIO
+from six.moves import socketserver
+
+# Local imports
+from ciocheck.config import SOCKET_FILE
+from ciocheck.templates import TEXT
+
+
+class CheckHandler(socketserver.StreamRequestHandler):
+    """Handle one json encoded check request per connection."""
+
+    def handle(self):
+        """Run the requested check and answer with its output."""
+        request = json.loads(self.rfile.readline().decode('utf-8'))
+        output, errors, code = self.server.run(request['cwd'],
+                                               request['argv'])
+        response = json.dumps({
+            'output': output,
+            'errors': errors,
+            'code': code
+        })
+        self.wfile.write(response.encode('utf-8') + b'\n')
+
+
+class CheckServer(socketserver.UnixStreamServer):
+    """
+    Serve check requests, keeping tools warm between them.
+
+    Formatter and linter modules stay imported, the vcs detection done by
+    each `FileManager` and the formatter worker pools are reused by the
+    following requests. Requests are handled one at a time.
+    """
+
+    def __init__(self, cmd_root):
+        """Serve check requests, keeping tools warm between them."""
+        self.cmd_root = cmd_root
+        self.socket_path = os.path.join(cmd_root, SOCKET_FILE)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        socketserver.UnixStreamServer.__init__(self, self.socket_path,
+                                               CheckHandler)
+        self.file_managers = {}
+        self.pools = {}
+
+    def run(self, cwd, argv):
+        """Run ciocheck for `argv` in `cwd`, return output, errors and code."""
+        from ciocheck.files import FileManager
+        from ciocheck.main import Runner, create_parser, split_paths
+
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = output = StringIO()
+        sys.stderr = errors = StringIO()
+        code = 0
+        try:
+            os.chdir(cwd)
+            cli_args = create_parser().parse_args(argv)
+            if cli_args.report_format != TEXT:
+                # The answer holds the report only
+                sys.stdout = sys.stderr
+            folders, files = split_paths(cwd, cli_args.folders)
+            if folders or files:
+                key = (cwd, tuple(folders), tuple(files))
+                file_manager = self.file_managers.get(key)
+                if file_manager is None:
+                    file_manager = FileManager(folders=folders, files=files)
+                    self.file_managers[key] = file_manager
+                file_manager.clear()
+
+                runner = Runner(
+                    cwd,
+                    cli_args,
+                    folders=folders,
+                    files=files,
+                    file_manager=file_manager,
+                    report_stream=output)
+                file_manager.vcs_listing = runner.config.get_value(
+                    'vcs_file_listing')
+                # Test modules imported in a long running process would go
+                # stale, so tests only run with the plain command
+                runner.disable_tests = True
+                runner.keep_alive = True
+                runner.exit_on_failure = False
+                pool_key = (cwd, tuple(runner.check), runner.cache is not None)
+                runner.pool = self.pools.get(pool_key)
+                if not runner.run():
+                    code = 1
+                if runner.pool is not None:
+                    self.pools[pool_key] = runner.pool
+            else:
+                print('Invalid folders or files!')
+        except SystemExit as err:
+            # Parser errors are printed to stderr, sys.exit may get a message
+            if err.code is None or isinstance(err.code, int):
+                code = err.code or 0
+            else:
+                print(err.code, file=sys.stderr)
+                code = 1
+        except Exception as err:
+            print('ciocheck daemon error: {0}'.format(err))
+            code = 1
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+            os.chdir(self.cmd_root)
+        return output.getvalue(), errors.getvalue(), code
+
+    def server_close(self):
+        """Stop worker pools and remove the socket file."""
+        socketserver.UnixStreamServer.server_close(self)
+        for pool in self.pools.values():
+            pool.close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def serve(cmd_root):
+    """Serve check requests on the socket file of `cmd_root`."""
+    if not hasattr(socketserver, 'UnixStreamServer'):
+        print('The ciocheck daemon needs unix sockets support.')
+        return
+
+    server = CheckServer(cmd_root)
+    print('ciocheck daemon listening on {0}'.format(server.socket_path))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def request(cwd, argv):
+    """Send a check request to the daemon, return output, errors and code."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(os.path.join(cwd, SOCKET_FILE))
+        message = json.dumps({'cwd': cwd, 'argv': argv})
+        client.sendall(message.encode('utf-8') + b'\n')
+        data = b''
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    finally:
+        client.close()
+    response = json.loads(data.decode('utf-8'))
+    return response['output'], response['errors'], response['code']
+
+
+def client_main():
+    """Thin client, runs ciocheck in process if no daemon is listening."""
+    cwd = os.getcwd()
+    try:
+        output, errors, code = request(cwd, sys.argv[1:])
+    except (AttributeError, socket.error):
+        from ciocheck.main import main
+        main()
+    else:
+        sys.stdout.write(output)
+        sys.stderr.write(errors)
+        sys.exit(code)
+
+
+if __name__ == '__main__':
+    client_main()
@@ -14,20 +14,27 @@ import os
 from ciocheck.config import (ALL_FILES, COMMITED_MODE, DEFAULT_BRANCH,
                              MODIFIED_FILES, MODIFIED_LINES, STAGED_MODE,
                              UNSTAGED_MODE)
-from ciocheck.utils import filter_files, get_files
+from ciocheck.utils import filter_files, get_files, timed
 from ciocheck.vcs import DiffTool
 
 
 class FileManager(object):
     """File manager with git support."""
 
-    def __init__(self, folders=None, files=None):
+    def __init__(self, folders=None, files=None, vcs_listing=True):
         """File manager with git support."""
         self.folders = folders or []
         self.files = files or []
         self.paths = self.files + self.folders
+        self.vcs_listing = vcs_listing
         self.diff_tool = DiffTool(paths=folders)
         self.cache = {}
+        self.timings = None  # Timings (ciocheck.utils), set by the runner
+
+    def clear(self):
+        """Forget cached file lists and diffs."""
+        self.cache = {}
+        self.diff_tool.clear()
 
     def get_files(self,
                   branch=DEFAULT_BRANCH,
@@ -40,8 +47,7 @@ class FileManager(object):
             results = self.cache[cache_key]
         else:
             if file_mode == ALL_FILES:
-                results = get_files(paths=self.paths)
-                results = filter_files(results, extensions)
+                results = filter_files(self.get_all_files(), extensions)
             elif file_mode == MODIFIED_FILES:
                 results = self.get_modified_files(
                     branch=branch, diff_mode=diff_mode, extensions=extensions)
@@ -52,6 +58,22 @@ class FileManager(object):
 
         return results
 
+    def get_all_files(self):
+        """Find all files in paths, listed once until cleared."""
+        if ALL_FILES not in self.cache:
+            if self.vcs_listing:
+                # List files from the vcs instead of walking
+                with timed(self.timings, 'walk', 'files'):
+                    results = get_files(paths=self.files)
+                with timed(self.timings, 'ls-files', 'vcs'):
+                    results += self.diff_tool.all_files()
+                results = list(sorted(set(results)))
+            else:
+                with timed(self.timings, 'walk', 'files'):
+                    results = get_files(paths=self.paths)
+            self.cache[ALL_FILES] = results
+        return self.cache[ALL_FILES]
+
     def get_modified_file_lines(self,
                                 branch=DEFAULT_BRANCH,
                                 diff_mode=STAGED_MODE,
@@ -61,12 +83,13 @@ class FileManager(object):
         if cache_key in self.cache:
             results = self.cache[cache_key]
         else:
-            if diff_mode == COMMITED_MODE:
-                results = self.diff_tool.commited_file_lines(branch=branch)
-            elif diff_mode == STAGED_MODE:
-                results = self.diff_tool.staged_file_lines()
-            elif diff_mode == UNSTAGED_MODE:
-                results = self.diff_tool.unstaged_file_lines()
+            with timed(self.timings, 'diff', 'vcs', mode=diff_mode):
+                if diff_mode == COMMITED_MODE:
+                    results = self.diff_tool.commited_file_lines(branch=branch)
+                elif diff_mode == STAGED_MODE:
+                    results = self.diff_tool.staged_file_lines()
+                elif diff_mode == UNSTAGED_MODE:
+                    results = self.diff_tool.unstaged_file_lines()
             results = filter_files(results, extensions)
             self.cache[cache_key] = results
 
@@ -81,12 +104,13 @@ class FileManager(object):
         if cache_key in self.cache:
             results = self.cache[cache_key]
         else:
-            if diff_mode == COMMITED_MODE:
-                results = self.diff_tool.commited_files(branch=branch)
-            elif diff_mode == STAGED_MODE:
-                results = self.diff_tool.staged_files()
-            elif diff_mode == UNSTAGED_MODE:
-                results = self.diff_tool.unstaged_files()
+            with timed(self.timings, 'diff', 'vcs', mode=diff_mode):
+                if diff_mode == COMMITED_MODE:
+                    results = self.diff_tool.commited_files(branch=branch)
+                elif diff_mode == STAGED_MODE:
+                    results = self.diff_tool.staged_files()
+                elif diff_mode == UNSTAGED_MODE:
+                    results = self.diff_tool.unstaged_files()
             results = filter_files(results, extensions)
             self.cache[cache_key] = results
 
@@ -14,32 +14,102 @@ import ast
 import json
 import os
 import sys
+import time
 
 # Local imports
-from ciocheck.formatters import MULTI_FORMATTERS
-from ciocheck.utils import filter_files
+from ciocheck.cache import ResultCache
+from ciocheck.registry import FORMATTER, get_registry
+from ciocheck.utils import FILE_CONTENTS, Timings, filter_files
 
 
-def format_file(path):
+def format_file(path, timings=None):
     """Format a file (path) using the available formatters."""
     root_path = os.environ.get('CIOCHECK_PROJECT_ROOT')
     check = ast.literal_eval(os.environ.get('CIOCHECK_CHECK'))
-    check_multi_formatters = [f for f in MULTI_FORMATTERS if f.name in check]
+    check_multi_formatters = [
+        spec.load() for spec in get_registry().specs(FORMATTER, check)
+        if spec.multi
+    ]
+    if os.environ.get('CIOCHECK_CACHE'):
+        cache = ResultCache(root_path)
+    else:
+        cache = None
 
-    results = {}
+    try:
+        old_contents = FILE_CONTENTS.read(path)
+    except (IOError, OSError, UnicodeDecodeError):
+        return {}
 
+    # Contents are handed from one formatter to the next, each result holds
+    # the diff of its own step, and the file is written once at the end
+    results = {}
+    contents = old_contents
     for formatter in check_multi_formatters:
         paths = filter_files([path], formatter.extensions)
         if paths:
             formatter.cmd_root = root_path
-            result = formatter.format_task(path)
+            formatter.cache = cache
+            start = time.time()
+            contents, result = formatter.format_contents(path, contents)
+            if timings is not None:
+                timings.add(formatter.name, 'format', start,
+                            time.time() - start, args={'path': path})
             if result:
                 results[formatter.name] = result
+
+    if contents != old_contents:
+        FILE_CONTENTS.write(path, contents, 'utf-8')
     return results
 
 
+def lint_paths(name, paths):
+    """Lint paths in process with the python api of linter `name`."""
+    root_path = os.environ.get('CIOCHECK_PROJECT_ROOT')
+    spec = get_registry().get(name)
+    if spec is None:
+        return []
+    return spec.load()(root_path).run_api(paths)
+
+
+def preload_formatters():
+    """Import the selected multi formatters before the first task."""
+    check = ast.literal_eval(os.environ.get('CIOCHECK_CHECK') or '[]')
+    for spec in get_registry().specs(FORMATTER, check):
+        if spec.multi:
+            try:
+                spec.load().preload()
+            except Exception:
+                # Reported on every file by the formatter instead
+                pass
+
+
+def worker():
+    """Format or lint paths read from stdin, one json task per line."""
+    # Formatters might print, so keep stdout for the results only
+    channel = sys.stdout
+    sys.stdout = sys.stderr
+    # The pool starts while git runs, so pay for the imports meanwhile
+    preload_formatters()
+    for line in iter(sys.stdin.readline, ''):
+        task = json.loads(line)
+        timings = Timings(lane='worker {0}'.format(os.getpid()))
+        if 'lint' in task:
+            with timings.span(task['lint'], 'lint', files=len(task['paths'])):
+                task_result = lint_paths(task['lint'], task['paths'])
+        else:
+            with timings.span('format_file', 'file', path=task['path']):
+                task_result = format_file(task['path'], timings)
+        answer = {'result': task_result, 'timings': timings.spans}
+        channel.write(json.dumps(answer) + '\n')
+        channel.flush()
+
+
 def main():
     """Main script."""
+    if sys.argv[1:] == ['--worker']:
+        worker()
+        sys.exit(0)
+
     task_results = []
     for filename in sys.argv[1:]:
         task_result = format_file(filename)
@@ -9,55 +9,71 @@
 
 # Standard library imports
 import codecs
-import json
+import copy
+import importlib
 import os
 import platform
 import re
-import subprocess
-import sys
 
 # Third party imports
-from yapf.yapflib.yapf_api import FormatCode
-import autopep8
-import isort
+from six import string_types
 
 # Local imports
 from ciocheck.config import DEFAULT_COPYRIGHT_HEADER
+from ciocheck.registry import FORMATTER, get_registry
 from ciocheck.tools import Tool
-from ciocheck.utils import atomic_replace, cpu_count, diff
-
-HERE = os.path.dirname(os.path.realpath(__file__))
+from ciocheck.utils import FILE_CONTENTS, diff
+from ciocheck.workers import WorkerPool
 
 
 class Formatter(Tool):
     """Generic formatter tool."""
 
+    # Imported by warm workers before their first task
+    preload_modules = ()
+
     @classmethod
-    def format_task(cls, path):
-        """Forma trask executed by paralell script helper."""
-        changed = False
-        old_contents, new_contents = '', ''
+    def format_contents(cls, path, old_contents):
+        """Format contents of path in memory and return (contents, result)."""
+        # Contents known to be left untouched by the formatter are skipped
+        key = None
+        if cls.cache is not None:
+            key = cls.cache.key(cls, path, old_contents)
+            if cls.cache.get(key) is not None:
+                return old_contents, {}
+
+        new_contents = old_contents
         error = None
         try:
-            old_contents, new_contents, encoding = cls.format_file(path)
-            changed = new_contents != old_contents
+            _, new_contents, _ = cls.format_string(old_contents)
         except Exception as err:
             error = "{name} crashed on {path}: {error}".format(
                 name=cls.name, path=path, error=err)
 
-        if changed:
+        if new_contents != old_contents:
             result = {
                 'path': path,
                 'error': error,
-                #            'new-contents': new_contents,
-                #            'old-contents': old_contents,
                 'diff': diff(old_contents, new_contents),
                 'created': False,  # pyformat might create new init files.
             }
-            atomic_replace(path, new_contents, encoding)
         else:
+            if key is not None and error is None:
+                cls.cache.set(key, {})
+            result = {}
+        return new_contents, result
+
+    @classmethod
+    def format_task(cls, path):
+        """Format a file with this formatter only and write it back."""
+        try:
+            old_contents = FILE_CONTENTS.read(path)
+        except (IOError, OSError, UnicodeDecodeError):
             return {}
 
+        new_contents, result = cls.format_contents(path, old_contents)
+        if result:
+            FILE_CONTENTS.write(path, new_contents, 'utf-8')
         return result
 
     @classmethod
@@ -65,11 +81,16 @@ class Formatter(Tool):
         """Format content of a file."""
         raise NotImplementedError
 
+    @classmethod
+    def preload(cls):
+        """Import the modules used by `format_string` ahead of time."""
+        for module_name in cls.preload_modules:
+            importlib.import_module(module_name)
+
     @classmethod
     def format_file(cls, path):
         """Format file for use with task queue."""
-        with open(path, 'r') as file_obj:
-            old_contents = file_obj.read()
+        old_contents = FILE_CONTENTS.read(path)
         return cls.format_string(old_contents)
 
     def run(self, paths):
@@ -87,6 +108,7 @@ class IsortFormatter(Formatter):
     # Config
     config_file = '.isort.cfg'
     config_sections = [('isort', 'settings')]
+    preload_modules = ('isort', )
 
     def run(self, paths):
         """Format paths."""
@@ -95,6 +117,8 @@ class IsortFormatter(Formatter):
     @classmethod
     def format_string(cls, old_contents):
         """Format content of a file."""
+        import isort
+
         new_contents = isort.SortImports(file_contents=old_contents).output
         return old_contents, new_contents, 'utf-8'
 
@@ -109,16 +133,56 @@ class YapfFormatter(Formatter):
     # Config
     config_file = '.style.yapf'
     config_sections = [('yapf:style', 'style')]
+    preload_modules = ('yapf.yapflib.yapf_api', )
+    default_style = 'pep8'
+    predefined_styles = (('pep8', 'CreatePEP8Style'),
+                         ('google', 'CreateGoogleStyle'),
+                         ('facebook', 'CreateFacebookStyle'),
+                         ('chromium', 'CreateChromiumStyle'),
+                         ('yapf', 'CreateYapfStyle'))
+
+    # Style memoized per worker, keyed by config path and modification time
+    _style = None
+    _style_config = None
+    _style_key = None
 
     def run(self, paths):
         """Format paths."""
         pass
 
+    @classmethod
+    def load_style(cls):
+        """Resolve the yapf style, parsing config only when it changes."""
+        from yapf.yapflib import style
+
+        key = cls.config_signature()
+        if cls._style_key != key:
+            config_path, mtime = key
+            style_config = config_path
+            if mtime is None or not os.path.getsize(config_path):
+                # No yapf section in the ciocheck config
+                style_config = cls.default_style
+            cls._style = style.CreateStyleFromConfig(style_config)
+
+            # Yapf reuses the global style when given no config, unless it
+            # matches a predefined style, so those are passed by name
+            cls._style_config = None
+            for name, factory_name in cls.predefined_styles:
+                factory = getattr(style, factory_name, None)
+                if factory is not None and cls._style == factory():
+                    cls._style_config = name
+                    break
+            cls._style_key = key
+        style.SetGlobalStyle(cls._style)
+        return cls._style_config
+
     @classmethod
     def format_string(cls, old_contents):
         """Format file for use with task queue."""
+        from yapf.yapflib.yapf_api import FormatCode
+
         # cmd_root is assigned to formatter inside format_task... ugly!
-        style_config = os.path.join(cls.cmd_root, cls.config_file)
+        style_config = cls.load_style()
         # It might be tempting to use the "inplace" option to FormatFile, but
         # it doesn't do an atomic replace, which is dangerous, so don't use
         # it unless you submit a fix to yapf.
@@ -145,17 +209,61 @@ class Autopep8Formatter(Formatter):
     # Config
     config_file = '.autopep8'
     config_sections = [('autopep8', 'pep8')]
+    preload_modules = ('autopep8', )
+    list_options = ('ignore', 'select')
+
+    # Options memoized per worker, keyed by config path and modification time
+    _options = None
+    _options_key = None
 
     def run(self, paths):
         """Format paths."""
         pass
 
+    @classmethod
+    def _make_options(cls, config_options):
+        """Turn config dictionary into options accepted by `fix_code`."""
+        import autopep8
+
+        options = autopep8.parse_args([''])
+        for name, value in config_options.items():
+            # Exclude only applies to file discovery, not to `fix_code`
+            if name == 'exclude':
+                continue
+
+            if name in cls.list_options:
+                if not isinstance(value, (list, tuple)):
+                    value = [value]
+                value = [str(v).strip().upper() for v in value
+                         if str(v).strip()]
+            elif not hasattr(options, name) or (
+                    isinstance(value, string_types) and not isinstance(
+                        getattr(options, name), string_types)):
+                print('Invalid autopep8 option: {0} = {1}'.format(name,
+                                                                  value))
+                continue
+
+            setattr(options, name, value)
+        return options
+
+    @classmethod
+    def get_options(cls):
+        """Return `fix_code` options, parsing config only when it changes."""
+        key = cls.config_signature()
+        if cls._options_key != key:
+            cls._options = cls._make_options(cls.make_config_dictionary())
+            cls._options_key = key
+
+        # `fix_code` changes some options in place
+        return copy.copy(cls._options)
+
     @classmethod
     def format_string(cls, old_contents):
         """Format file for use with task queue."""
-        config_options = cls.make_config_dictionary()
-        config_options = {}
-        new_contents = autopep8.fix_code(old_contents, options=config_options)
+        import autopep8
+
+        new_contents = autopep8.fix_code(
+            old_contents, options=cls.get_options())
         return old_contents, new_contents, 'utf-8'
 
 
@@ -165,23 +273,12 @@ class MultiFormatter(object):
     language = 'generic'
     name = 'multiformatter'
 
-    def __init__(self, cmd_root, check):
+    def __init__(self, cmd_root, check, pool=None, cache=False):
         """Formatter handling multiple formatters in parallel."""
         self.cmd_root = cmd_root
         self.check = check
-
-    def _format_files(self, paths):
-        """Helper method to start a seaparate subprocess."""
-        cmd = [sys.executable, os.path.join(HERE, 'format_task.py')]
-        env = os.environ.copy()
-        env['CIOCHECK_PROJECT_ROOT'] = self.cmd_root
-        env['CIOCHECK_CHECK'] = str(self.check)
-        proc = subprocess.Popen(
-            cmd + paths,
-            env=env,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE)
-        return proc
+        self.pool = pool
+        self.cache = cache
 
     def _format_results(self, results):
         """Rearrange results for standard consumption."""
@@ -201,79 +298,35 @@ class MultiFormatter(object):
     def extensions(self):
         """Return all extensions of the used multiformatters."""
         all_extensions = []
-        for formatter in MULTI_FORMATTERS:
-            all_extensions += list(formatter.extensions)
+        for spec in get_registry().specs(FORMATTER, self.check):
+            if spec.multi:
+                all_extensions += list(spec.extensions)
         return all_extensions
 
     def run(self, paths):
         """
         Run formatters.
 
-        This uses some silly multi-process stuff because Yapf is very slow and
-        CPU-bound.
-
-        Not using a multiprocessing because not sure how its "magic" (pickling,
-        __main__ import) really works.
+        Yapf is very slow and CPU-bound, so files are handed one at a time
+        to a pool of warm `format_task.py` workers (one per core) that import
+        the formatters only once. If no pool was provided, a temporary one is
+        created for this run.
         """
-        processes = []
         if isinstance(paths, dict):
             paths = list(sorted(paths.keys()))
+        else:
+            paths = list(sorted(paths))
 
-        def await_one_process():
-            """Wait for one process and parse output."""
-            if processes:
-                # We pop(0) because the first process is the oldest
-                proc = processes.pop(0)
-                output, error = proc.communicate()
-
-                if isinstance(output, bytes):
-                    output = output.decode()
-
-                if isinstance(error, bytes):
-                    error = error.decode()
-
-                output = json.loads(output)
-                if error:
-                    print(error)
-
-                return output, error
+        pool = self.pool or WorkerPool(
+            self.cmd_root, self.check, cache=self.cache)
+        try:
+            outputs = pool.map([{'path': path} for path in paths])
+        finally:
+            if pool is not self.pool:
+                pool.close()
 
-        def await_all_processes():
-            """Wait for all processes."""
-            results = []
-            while processes:
-                output, error = await_one_process()
-                output = [o for o in output if o]
-                if output:
-                    results += output
-                if error:
-                    print(error)
-            return results
-
-        def take_n(items, amount):
-            """Take n items to pass to the processes."""
-            result = []
-            while amount > 0 and items:
-                result.append(items.pop(0))  # Keep order
-                amount = amount - 1
-            return list(sorted(result))
-
-        while paths:
-            # We send a few files to each process to try to reduce per-process
-            # setup time
-            some_files = take_n(paths, 3)
-            processes.append(self._format_files(some_files))
-
-            # Don't run too many at once, this is a goofy algorithm
-            if len(processes) > (cpu_count() * 3):
-                while len(processes) > cpu_count():
-                    await_one_process()
-
-        assert [] == paths
-        results = await_all_processes()
-        results = self._format_results(results)
-        assert [] == processes
-        return results
+        results = [output for output in outputs if output]
+        return self._format_results(results)
 
 
 class PythonFormatter(Formatter):
@@ -306,8 +359,7 @@ class PythonFormatter(Formatter):
 
     def _add_headers(self, path, header, copy):
         """Add headers as needed in file."""
-        with codecs.open(path, 'r', 'utf-8') as file_obj:
-            old_contents = file_obj.read()
+        old_contents = FILE_CONTENTS.read(path, universal_newlines=False)
 
         have_encoding = (self.encoding_header in old_contents)
         have_copyright = (self.COPYRIGHT_RE.search(old_contents) is not None)
@@ -346,7 +398,7 @@ class PythonFormatter(Formatter):
                 'added-copy': not have_encoding and header,
                 'added-header': not have_copyright and copy,
             }
-            atomic_replace(path, new_contents, 'utf-8')
+            FILE_CONTENTS.write(path, new_contents, 'utf-8')
         else:
             results = {}
         return results
@@ -419,19 +471,6 @@ class PythonFormatter(Formatter):
         return results
 
 
-MULTI_FORMATTERS = [
-    IsortFormatter,
-    YapfFormatter,
-    Autopep8Formatter,
-]
-FORMATTERS = [
-    PythonFormatter,
-    IsortFormatter,
-    YapfFormatter,
-    Autopep8Formatter,
-]
-
-
 def test():
     """Main local test."""
     pass
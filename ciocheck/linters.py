@@ -11,10 +11,12 @@
 import json
 import os
 import re
+import sys
 
 # Local imports
 from ciocheck.tools import Tool
-from ciocheck.utils import run_command
+from ciocheck.utils import (FILE_CONTENTS, ProcessError, balanced_shards,
+                            cpu_count, iter_command, merge_iterators)
 
 
 class Linter(Tool):
@@ -22,24 +24,43 @@ class Linter(Tool):
 
     # Regex matching
     pattern = None
+    record_lines = 1  # Output lines making up a single matched record
 
     # Json matching
     json_keys = []  # ((old_key, new_key), ...)
     output_on_stderr = False
 
+    # In process matching, through the python api of the tool
+    api = False
+
+    # Extra arguments of sharded runs, e.g. to disable the tool's own jobs
+    shard_args = ()
+
     def __init__(self, cmd_root):
         """Generic linter with json and regex output support."""
         super(Linter, self).__init__(cmd_root)
         self.paths = None
         self.regex = None
+        self.shard = False
+        self.pool = None  # Worker pool (ciocheck.workers) for in process runs
+
+    def _iter_parse_regex(self, lines):
+        """Parse output lines with grouped regex as they arrive."""
+        self.regex = re.compile(self.pattern, re.VERBOSE)
+        window = []
+        for line in lines:
+            window.append(line.rstrip('\r\n'))
+            if len(window) == self.record_lines:
+                matches = self.regex.search('\n'.join(window))
+                if matches:
+                    window = []
+                    yield matches.groupdict()
+                else:
+                    window.pop(0)
 
     def _parse_regex(self, string):
         """Parse output with grouped regex."""
-        results = []
-        self.regex = re.compile(self.pattern, re.VERBOSE)
-        for matches in self.regex.finditer(string):
-            results.append(matches.groupdict())
-        return results
+        return list(self._iter_parse_regex(string.splitlines()))
 
     def _parse_json(self, string):
         """Parse output with json keys."""
@@ -68,23 +89,107 @@ class Linter(Tool):
         """Override in case extra processing on results is needed."""
         return results
 
-    def run(self, paths):
-        """Run linter and return a list of dicts."""
-        self.paths = list(paths.keys()) if isinstance(paths, dict) else paths
-        if self.paths:
-            args = list(self.command)
-            args += self.paths
-            out, err = run_command(args)
-            if self.output_on_stderr:
-                string = err
-            else:
-                string = out
-            results = self._parse(string)
-            results = self.extra_processing(results)
+    def _iter_command(self, paths, extra_args=()):
+        """Run linter command on paths and yield dicts as output arrives."""
+        args = list(self.command)
+        args += extra_args
+        args += paths
+        lines = iter_command(args, stderr=self.output_on_stderr)
+        if self.json_keys:
+            # A json document can only be parsed once complete
+            results = self.extra_processing(self._parse_json(''.join(lines)))
+            for result in results:
+                yield result
+        elif self.pattern:
+            for result in self._iter_parse_regex(lines):
+                for item in self.extra_processing([result]):
+                    yield item
         else:
-            results = []
+            raise Exception('Either a pattern or a json key mapping has to '
+                            'be defined.')
 
-        return results
+    def run_api(self, paths):
+        """Run linter through its python api and return a list of dicts."""
+        raise NotImplementedError
+
+    def _iter_pool(self, paths):
+        """Run linter api on the worker pool and yield dicts."""
+        shards = balanced_shards(paths, min(self.pool.workers, len(paths)))
+        tasks = [{'lint': self.name, 'paths': shard} for shard in shards]
+        failed = 0
+        for results in self.pool.map(tasks):
+            if results is None:
+                # The worker crashed or timed out, so results are missing
+                failed += 1
+                continue
+            for item in self.extra_processing(results):
+                yield item
+        if failed:
+            raise ProcessError('{0} worker task(s) failed: {1}'.format(
+                failed, self.name))
+
+    def _iter_run(self, paths):
+        """Run linter on paths, split in balanced shards if enabled."""
+        if self.api and self.pool is not None:
+            return self._iter_pool(paths)
+
+        count = min(cpu_count(), len(paths)) if self.shard else 1
+        if count > 1:
+            shards = balanced_shards(paths, count)
+            return merge_iterators([
+                self._iter_command(shard, self.shard_args) for shard in shards
+            ])
+        else:
+            return self._iter_command(paths)
+
+    def create_config(self, config):
+        """Create config file and check if the linter should be sharded."""
+        super(Linter, self).create_config(config)
+        self.shard = self.name in config.get_value('shard_linters')
+
+    def _store_results(self, keys, results):
+        """Store results grouped by path in the cache."""
+        grouped = dict((os.path.abspath(path), []) for path in keys)
+        for result in results:
+            path = os.path.abspath(result['path'])
+            if path not in grouped:
+                # Can not attribute the result, so do not cache this batch
+                return
+            grouped[path].append(result)
+
+        for path, key in keys.items():
+            self.cache.set(key, grouped[os.path.abspath(path)])
+
+    def iter_results(self, paths):
+        """Run linter and yield dicts as soon as they are parsed."""
+        self.paths = list(paths.keys()) if isinstance(paths, dict) else paths
+        pending = self.paths or []
+        keys = {}
+
+        if self.cache is not None and pending:
+            pending = []
+            for path in self.paths:
+                key = self.cache.key(self, path)
+                cached_results = self.cache.get(key)
+                if cached_results is None:
+                    keys[path] = key
+                    pending.append(path)
+                else:
+                    for result in cached_results:
+                        yield result
+
+        if pending:
+            new_results = []
+            for result in self._iter_run(pending):
+                if self.cache is not None:
+                    new_results.append(result)
+                yield result
+            if self.cache is not None:
+                self._store_results(keys, new_results)
+
+    def run(self, paths):
+        """Run linter and return a list of dicts."""
+        return list(self.iter_results(paths))
 
 
 class Flake8Linter(Linter):
@@ -105,6 +210,41 @@ class Flake8Linter(Linter):
         (?P<type>[EWFCNTIBDSQ]\d{3})\s
         (?P<message>.*)
         '''
+    api = True
+    # Shards already run in parallel, so do not fork any further
+    shard_args = ('--jobs=1', )
+
+    def run_api(self, paths):
+        """Run flake8 through its legacy api and return a list of dicts."""
+        from flake8.api import legacy
+        from flake8.formatting.base import BaseFormatter
+
+        results = []
+
+        class CollectFormatter(BaseFormatter):
+            """Collect flake8 errors instead of printing them."""
+
+            def handle(self, error):
+                """Store error as a dict."""
+                results.append({
+                    'path': error.filename,
+                    'line': str(error.line_number),
+                    'column': str(error.column_number),
+                    'type': error.code,
+                    'message': error.text,
+                })
+
+        try:
+            from flake8.main.options import JobsArgument
+            jobs = JobsArgument('1')
+        except ImportError:
+            jobs = '1'
+
+        # Workers already run in parallel, so do not fork any further
+        style_guide = legacy.get_style_guide(jobs=jobs)
+        style_guide.init_report(CollectFormatter)
+        style_guide.check_files(paths)
+        return results
 
 
 class Pep8Linter(Linter):
@@ -124,6 +264,61 @@ class Pep8Linter(Linter):
         (?P<type>[EWFCNTIBDSQ]\d{3})\s
         (?P<message>.*)
         '''
+    api = True
+
+    def run_api(self, paths):
+        """Run pep8 through its style guide api and return a list of dicts."""
+        try:
+            import pep8 as pycodestyle
+        except ImportError:
+            import pycodestyle
+
+        class ContentsChecker(pycodestyle.Checker):
+            """Check source lines from the shared file contents."""
+
+            def __init__(self, filename=None, lines=None, **kwargs):
+                """Check source lines from the shared file contents."""
+                if lines is None and filename:
+                    try:
+                        lines = FILE_CONTENTS.lines(filename)
+                    except (IOError, OSError, UnicodeDecodeError):
+                        # Let pep8 read and report the file itself
+                        lines = None
+                pycodestyle.Checker.__init__(
+                    self, filename, lines=lines, **kwargs)
+
+        class CollectReport(pycodestyle.BaseReport):
+            """Collect pep8 errors instead of printing them."""
+
+            def __init__(self, options):
+                """Collect pep8 errors instead of printing them."""
+                pycodestyle.BaseReport.__init__(self, options)
+                self.results = []
+
+            def error(self, line_number, offset, text, check):
+                """Store error as a dict if it is reported."""
+                code = pycodestyle.BaseReport.error(self, line_number, offset,
+                                                    text, check)
+                if code:
+                    self.results.append({
+                        'path': self.filename,
+                        'line': str(line_number),
+                        'column': str(offset + 1),
+                        'type': code,
+                        'message': text[5:],
+                    })
+                return code
+
+        config_file = os.path.join(self.cmd_root, self.config_file)
+        if not os.path.isfile(config_file):
+            config_file = False
+        style_guide = pycodestyle.StyleGuide(
+            paths=paths,
+            config_file=config_file,
+            reporter=CollectReport,
+            checker_class=ContentsChecker)
+        report = style_guide.check_files()
+        return report.results
 
 
 class PydocstyleLinter(Linter):
@@ -136,6 +331,7 @@ class PydocstyleLinter(Linter):
     config_file = '.pydocstyle'
     config_sections = [('pydocstyle', 'pydocstyle')]
     output_on_stderr = True
+    record_lines = 2
 
     # Match lines of the form:
     # ./bootstrap.py:1 at module level:
@@ -147,6 +343,46 @@ class PydocstyleLinter(Linter):
         (?P<type>D\d{3}):\s
         (?P<message>.*)
         '''
+    api = True
+
+    def run_api(self, paths):
+        """Run pydocstyle through its api and return a list of dicts."""
+        from pydocstyle.checker import ConventionChecker
+        from pydocstyle.config import ConfigurationParser
+        from pydocstyle.violations import Error
+
+        # The configuration parser reads options from the command line
+        argv = sys.argv
+        sys.argv = [self.name] + list(paths)
+        try:
+            conf = ConfigurationParser()
+            conf.parse()
+            files_to_check = list(conf.get_files_to_check())
+        finally:
+            sys.argv = argv
+
+        results = []
+        for item in files_to_check:
+            filename, checked_codes, ignore_decorators = item[:3]
+            try:
+                source = FILE_CONTENTS.read(filename)
+                errors = list(ConventionChecker().check_source(
+                    source, filename, ignore_decorators))
+            except Exception:
+                # Files that can not be parsed are skipped, like the
+                # warnings pydocstyle prints for them
+                continue
+
+            for error in errors:
+                if isinstance(error, Error) and error.code in checked_codes:
+                    results.append({
+                        'path': error.filename,
+                        'line': str(error.line),
+                        'symbol': str(error.definition),
+                        'type': error.code,
+                        'message': error.message.split(': ', 1)[-1],
+                    })
+        return results
 
 
 class PylintLinter(Linter):
@@ -172,14 +408,6 @@ class PylintLinter(Linter):
         return results
 
 
-LINTERS = [
-    Pep8Linter,
-    PydocstyleLinter,
-    Flake8Linter,
-    PylintLinter,
-]
-
-
 def test():
     """Main local test."""
     here = os.path.dirname(os.path.realpath(__file__))
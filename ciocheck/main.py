@@ -10,27 +10,46 @@
 # Standard library imports
 from collections import OrderedDict
 import argparse
+import json
 import os
 import shutil
 import sys
 
 # Local imports
+from ciocheck.cache import ResultCache
 from ciocheck.config import ALL_FILES, load_config
 from ciocheck.files import FileManager
-from ciocheck.formatters import FORMATTERS, MULTI_FORMATTERS, MultiFormatter
-from ciocheck.linters import LINTERS
-from ciocheck.tools import TOOLS
+from ciocheck.formatters import MultiFormatter
+from ciocheck.registry import FORMATTER, LINTER, TESTER, get_registry
+from ciocheck.templates import (REPORTERS, TEXT, get_added_lines,
+                                get_reporter, is_reported)
+from ciocheck.utils import (PROCESS_RUNNER, ProcessError, Timings,
+                            filter_files, filter_paths, run_threads)
+from ciocheck.vcs import ALL_LINES
+from ciocheck.watch import get_watcher
+from ciocheck.workers import WorkerPool
 
 
 class Runner(object):
     """Main tool runner."""
 
-    def __init__(self, cmd_root, cli_args, folders=None, files=None):
+    def __init__(self,
+                 cmd_root,
+                 cli_args,
+                 folders=None,
+                 files=None,
+                 file_manager=None,
+                 report_stream=None):
         """Main tool runner."""
         # Run options
         self.cmd_root = cmd_root  # Folder on which the command was executed
-        self.config = load_config(cmd_root, cli_args)
-        self.file_manager = FileManager(folders=folders, files=files)
+        self.timings = Timings()
+        with self.timings.span('config'):
+            self.config = load_config(cmd_root, cli_args)
+        self.file_manager = file_manager or FileManager(
+            folders=folders,
+            files=files,
+            vcs_listing=self.config.get_value('vcs_file_listing'))
         self.folders = folders
         self.files = files
         self.all_results = OrderedDict()
@@ -43,9 +62,87 @@ class Runner(object):
         self.diff_mode = self.config.get_value('diff_mode')
         self.file_mode = self.config.get_value('file_mode')
         self.branch = self.config.get_value('branch')
+        self.parallel_linters = self.config.get_value('parallel_linters')
+        self.inprocess_linters = self.config.get_value('inprocess_linters')
+        max_processes = self.config.get_value('max_processes')
+        process_timeout = self.config.get_value('process_timeout')
+        PROCESS_RUNNER.configure(
+            max_processes=int(max_processes) if max_processes else None,
+            timeout=float(process_timeout) if process_timeout else None)
+        if self.config.get_value('cache'):
+            self.cache = ResultCache(cmd_root)
+        else:
+            self.cache = None
         self.disable_formatters = cli_args.disable_formatters
         self.disable_linters = cli_args.disable_linters
         self.disable_tests = cli_args.disable_tests
+        self.reporter = get_reporter(
+            getattr(cli_args, 'report_format', None) or TEXT,
+            cmd_root,
+            stream=report_stream)
+        self.timings_output = getattr(cli_args, 'timings', False)
+        self.timings_file = getattr(cli_args, 'timings_file', None)
+        self.trace_output = getattr(cli_args, 'trace', None)
+
+        # Keep tools and formatter workers alive between runs (watch mode)
+        self.keep_alive = False
+        self.exit_on_failure = True
+        self.pool = None
+        self.watch_paths = None  # Explicit changed files to check
+
+    def get_files(self, extensions, file_mode=None):
+        """Return the files to check for the given extensions."""
+        file_mode = file_mode or self.file_mode
+        if self.watch_paths is not None and file_mode == ALL_FILES:
+            return filter_files(self.watch_paths, extensions)
+
+        with self.timings.span('files'):
+            files = self.file_manager.get_files(
+                branch=self.branch,
+                diff_mode=self.diff_mode,
+                file_mode=file_mode,
+                extensions=extensions)
+        if self.watch_paths is not None:
+            # Keep the changed lines of the saved files only
+            files = filter_paths(files, self.watch_paths)
+        return files
+
+    def get_tool(self, spec):
+        """Return a tool instance, reusing the loaded one if kept alive."""
+        tool = self.all_tools.get(spec.name)
+        if tool is None or not self.keep_alive:
+            tool = spec.load()(self.cmd_root)
+            self.all_tools[tool.name] = tool
+        return tool
+
+    def add_results(self, tool_name, files, results, reported=False):
+        """Keep the results of a tool and hand them to the reporter."""
+        self.all_results[tool_name] = {
+            'files': files,
+            'results': results,
+        }
+        if not reported:
+            self.reporter.add_results(tool_name, files, results)
+
+    def run_tool(self, tool, files, lane=None):
+        """Run a tool on files and time it."""
+        with self.timings.span(tool.name, 'tool', lane=lane):
+            return tool.run(files)
+
+    def run_linter(self, tool, files, lane=None):
+        """Run a linter, reporting each result as soon as it is parsed."""
+        results = []
+        with self.timings.span(tool.name, 'tool', lane=lane):
+            try:
+                for result in tool.iter_results(files):
+                    self.reporter.add_result(tool.name, files, result)
+                    results.append(result)
+            except ProcessError as err:
+                # Output is incomplete, so the check can not pass
+                print('"{0}" failed: {1}'.format(tool.name, err))
+                self.failed_checks.add(tool.name)
+        self.reporter.end_tool(tool.name, files)
+        return results
 
     def run(self):
         """Run tools."""
@@ -56,110 +153,210 @@ class Runner(object):
         print('=' * len(msg))
         print('')
         self.clean()
-
-        check_linters = [l for l in LINTERS if l.name in self.check]
-        check_formatters = [f for f in FORMATTERS if f.name in self.check]
-        check_testers = [t for t in TOOLS if t.name in self.check]
-        run_multi = any(f for f in MULTI_FORMATTERS if f.name in self.check)
-
-        # Format before lint, linters may complain about bad formatting
-
-        # Formatters
-        if not self.disable_formatters:
-            for formatter in check_formatters:
-                print('Running "{}" ...'.format(formatter.name))
-                tool = formatter(self.cmd_root)
-                files = self.file_manager.get_files(
-                    branch=self.branch,
-                    diff_mode=self.diff_mode,
-                    file_mode=self.file_mode,
-                    extensions=tool.extensions)
-                tool.create_config(self.config)
-                self.all_tools[tool.name] = tool
-                results = tool.run(files)
-                # Pyformat might include files in results that are not in files
-                # like when an init is created
-                if results:
-                    self.all_results[tool.name] = {
-                        'files': files,
-                        'results': results,
-                    }
-
-            # The result of the the multi formatter is special!
-            if run_multi:
-                print('Running "Multi formatter"')
-                tool = MultiFormatter(self.cmd_root, self.check)
-                files = self.file_manager.get_files(
-                    branch=self.branch,
-                    diff_mode=self.diff_mode,
-                    file_mode=self.file_mode,
-                    extensions=tool.extensions)
-                multi_results = tool.run(files)
-                for key, values in multi_results.items():
-                    self.all_results[key] = {
-                        'files': files,
-                        'results': values,
-                    }
-
-        # Linters
-        if not self.disable_linters:
-            for linter in check_linters:
-                print('Running "{}" ...'.format(linter.name))
-                tool = linter(self.cmd_root)
-                files = self.file_manager.get_files(
-                    branch=self.branch,
-                    diff_mode=self.diff_mode,
-                    file_mode=self.file_mode,
-                    extensions=tool.extensions)
-                self.all_tools[tool.name] = tool
-                tool.create_config(self.config)
-                self.all_results[tool.name] = {
-                    'files': files,
-                    'results': tool.run(files),
-                }
-
-        # Tests
-        if not self.disable_tests:
-            for tester in check_testers:
-                print('Running "{}" ...'.format(tester.name))
-                tool = tester(self.cmd_root)
-                tool.create_config(self.config)
-                self.all_tools[tool.name] = tool
-
-                if tool.name == 'pytest':
-                    tool.setup_pytest_coverage_args(self.folders)
-
-                files = self.file_manager.get_files(
-                    branch=self.branch,
-                    diff_mode=self.diff_mode,
-                    file_mode=ALL_FILES,
-                    extensions=tool.extensions)
-                results = tool.run(files)
-                if results:
-                    results['files'] = files
-                    self.test_results = results
-
-        for tool in LINTERS + FORMATTERS + TOOLS:
+        self.all_results = OrderedDict()
+        self.test_results = None
+        self.failed_checks = set()
+        self.file_manager.timings = self.timings
+        PROCESS_RUNNER.timings = self.timings
+        if self.cache is not None:
+            # Tools or config might have changed since the last run
+            self.cache.clear()
+
+        registry = get_registry()
+        check_linters = registry.specs(LINTER, self.check)
+        check_formatters = registry.specs(FORMATTER, self.check)
+        check_testers = registry.specs(TESTER, self.check)
+        run_multi = not self.disable_formatters and any(
+            spec.multi for spec in check_formatters)
+        run_api = self.inprocess_linters and not self.disable_linters and any(
+            spec.api for spec in check_linters)
+
+        if (run_multi or run_api) and self.pool is None:
+            # Warm up the workers while git and pyformat run
+            self.pool = WorkerPool(
+                self.cmd_root, self.check, cache=self.cache is not None)
+            self.pool.start()
+        if self.pool is not None:
+            self.pool.timings = self.timings
+
+        try:
+            # Format before lint, linters may complain about bad formatting
+            if not self.disable_formatters:
+                self.run_formatters(check_formatters,
+                                    self.pool if run_multi else None)
+
+            if not self.disable_linters:
+                self.run_linters(check_linters)
+
+            if not self.disable_tests:
+                self.run_testers(check_testers)
+        except KeyboardInterrupt:
+            PROCESS_RUNNER.cancel()
+            raise
+        finally:
+            if not self.keep_alive:
+                self.close()
+
+        # Loaded tools and multi formatters could have created a config file
+        for tool in self.all_tools.values():
             tool.remove_config(self.cmd_root)
+        for spec in check_formatters:
+            if spec.multi:
+                spec.remove_config(self.cmd_root)
         self.clean()
 
-        self.process_results(self.all_results)
-        if self.enforce_checks():
+        with self.timings.span('results'):
+            self.process_results(self.all_results)
+        if self.timings_output or self.timings_file:
+            self.report_timings()
+        if self.trace_output:
+            self.write_trace()
+        success = self.enforce_checks()
+        if success:
             msg = 'Ciocheck successful run'
             print('\n\n' + '=' * len(msg))
             print(msg)
             print('=' * len(msg))
             print('')
+        return success
+
+    def watch(self):
+        """Run once, then check again the files changed on every save."""
+        self.keep_alive = True
+        self.exit_on_failure = False
+        watcher = get_watcher((self.folders or []) + (self.files or []))
+        try:
+            self.run()
+            watcher.reset()
+            while True:
+                print('\nWatching for changes... (Ctrl+C to stop)')
+                self.watch_paths = watcher.wait()
+                self.timings = Timings()
+                # Saved files changed the diff, so compute it again
+                self.file_manager.clear()
+                # Tests are too slow to run on every save
+                self.disable_tests = True
+                self.run()
+                # Ignore the changes made by the formatters
+                watcher.reset()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+            self.close()
+
+    def report_timings(self):
+        """Print the timings summary and save them as json if asked."""
+        if self.timings_output:
+            self.timings.print_summary(self.cmd_root)
+        if self.timings_file:
+            path = os.path.join(self.cmd_root, self.timings_file)
+            with open(path, 'w') as file_obj:
+                json.dump(self.timings.to_json(), file_obj, indent=2)
+
+    def write_trace(self):
+        """Save the timed spans as a Chrome trace, one lane per process."""
+        path = os.path.join(self.cmd_root, self.trace_output)
+        with open(path, 'w') as file_obj:
+            json.dump(self.timings.to_trace(), file_obj)
+        print('Trace saved to {0}'.format(path))
+
+    def close(self):
+        """Stop the formatter workers."""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def run_formatters(self, check_formatters, pool=None):
+        """Run formatters and the multi formatter if `pool` is provided."""
+        for formatter in check_formatters:
+            files = self.get_files(formatter.extensions)
+            if self.watch_paths is not None and not files:
+                continue
+            if formatter.multi:
+                # Run by the multi formatter, the workers only read config
+                formatter.create_config(self.cmd_root, self.config)
+                continue
+            print('Running "{}" ...'.format(formatter.name))
+            tool = self.get_tool(formatter)
+            tool.create_config(self.config)
+            results = self.run_tool(tool, files)
+            # Pyformat might include files in results that are not in files
+            # like when an init is created
+            if results:
+                self.add_results(tool.name, files, results)
+
+        # The result of the the multi formatter is special!
+        if pool is not None:
+            print('Running "Multi formatter"')
+            tool = MultiFormatter(self.cmd_root, self.check, pool=pool)
+            files = self.get_files(tool.extensions)
+            multi_results = self.run_tool(tool, files)
+            for key, values in multi_results.items():
+                self.add_results(key, files, values)
+
+    def run_linters(self, check_linters):
+        """Run linters."""
+        linter_tasks = []
+        for linter in check_linters:
+            files = self.get_files(linter.extensions)
+            if self.watch_paths is not None and not files:
+                continue
+            tool = self.get_tool(linter)
+            tool.create_config(self.config)
+            tool.cache = self.cache
+            tool.pool = self.pool if self.inprocess_linters else None
+            linter_tasks.append((tool, files))
+
+        if self.parallel_linters:
+            # Linters share no state, so launch all of them at once
+            for tool, files in linter_tasks:
+                print('Running "{}" ...'.format(tool.name))
+            linter_results = run_threads([
+                (self.run_linter, (tool, files, 'thread ' + tool.name))
+                for tool, files in linter_tasks
+            ])
+        else:
+            linter_results = []
+            for tool, files in linter_tasks:
+                print('Running "{}" ...'.format(tool.name))
+                linter_results.append(self.run_linter(tool, files))
+
+        for (tool, files), results in zip(linter_tasks, linter_results):
+            self.add_results(tool.name, files, results, reported=True)
+
+    def run_testers(self, check_testers):
+        """Run test tools."""
+        for tester in check_testers:
+            print('Running "{}" ...'.format(tester.name))
+            tool = self.get_tool(tester)
+            tool.create_config(self.config)
+
+            if tool.name == 'pytest':
+                tool.setup_pytest_coverage_args(self.folders)
+
+            files = self.get_files(tool.extensions, file_mode=ALL_FILES)
+            results = self.run_tool(tool, files)
+            if results:
+                results['files'] = files
+                self.test_results = results
 
     def process_results(self, all_results):
         """Group all results by file path."""
-        all_changed_paths = []
+        # Index results by tool and path once, so the report is linear on
+        # the number of results
+        results_index = OrderedDict()
+        all_changed_paths = set()
         for tool_name, data in all_results.items():
             if data:
-                files, results = data['files'], data['results']
-                all_changed_paths += [result['path'] for result in results]
+                results_by_path = {}
+                for result in data['results']:
+                    path = result['path']
+                    results_by_path.setdefault(path, []).append(result)
+                all_changed_paths.update(results_by_path)
+                results_index[tool_name] = (data['files'], results_by_path)
 
-        all_changed_paths = list(sorted(set(all_changed_paths)))
+        all_changed_paths = list(sorted(all_changed_paths))
 
         if self.test_results:
             test_files = self.test_results.get('files')
@@ -173,65 +370,64 @@ class Runner(object):
             print('')
             print(short_path)
             print('-' * len(short_path))
-            for tool_name, data in all_results.items():
-                if data:
-                    files, results = data['files'], data['results']
-                    lines = [[-1], range(100000)]
-
-                    if isinstance(files, dict):
-                        added_lines = files.get(path, lines)[-1]
-                    else:
-                        added_lines = lines[-1]
-
-                    messages = []
-                    for result in results:
-                        res_path = result['path']
-                        if path == res_path:
-                            # LINTERS
-                            line = int(result.get('line', -1))
-                            created = result.get('created')
-                            added_copy = result.get('added-copy')
-                            added_header = result.get('added-header')
-                            diff = result.get('diff')
-                            if line and line in list(added_lines):
-                                spaces = (8 - len(str(line))) * ' '
-                                args = result.copy()
-                                args['spaces'] = spaces
-                                msg = ('    {line}:{spaces}'
-                                       '{type}: {message}').format(**args)
-                                messages.append(msg)
-
-                            # Formatters
-                            if created:
-                                msg = '    __init__ file created.'
-                                messages.append(msg)
-                            if added_copy:
-                                msg = '    added copyright.'
-                                messages.append(msg)
-                            if added_header:
-                                msg = '    added header.'
-                                messages.append(msg)
-                            if diff:
-                                msg = self.format_diff(diff)
-                                messages.append(msg)
-
-                            # TESTERS / COVERAGE
-
-                    test = [r['path'] for r in results if path == r['path']]
-                    if test and messages:
-                        print('\n  ' + tool_name)
-                        print('  ' + '-' * len(tool_name))
-                        self.failed_checks.add(tool_name)
-                        for message in messages:
-                            print(message)
+            for tool_name, (files, results_by_path) in results_index.items():
+                results = results_by_path.get(path)
+                if not results:
+                    continue
+
+                added_lines = get_added_lines(files, path)
+
+                messages = []
+                for result in results:
+                    if not is_reported(result, added_lines):
+                        continue
+
+                    # LINTERS
+                    line = int(result.get('line', -1))
+                    created = result.get('created')
+                    added_copy = result.get('added-copy')
+                    added_header = result.get('added-header')
+                    diff = result.get('diff')
+                    if line and line in added_lines:
+                        spaces = (8 - len(str(line))) * ' '
+                        args = result.copy()
+                        args['spaces'] = spaces
+                        msg = ('    {line}:{spaces}'
+                               '{type}: {message}').format(**args)
+                        messages.append(msg)
+
+                    # Formatters
+                    if created:
+                        msg = '    __init__ file created.'
+                        messages.append(msg)
+                    if added_copy:
+                        msg = '    added copyright.'
+                        messages.append(msg)
+                    if added_header:
+                        msg = '    added header.'
+                        messages.append(msg)
+                    if diff:
+                        msg = self.format_diff(diff)
+                        messages.append(msg)
+
+                    # TESTERS / COVERAGE
+
+                if messages:
+                    print('\n  ' + tool_name)
+                    print('  ' + '-' * len(tool_name))
+                    self.failed_checks.add(tool_name)
+                    for message in messages:
+                        print(message)
 
             if isinstance(test_files, dict) and test_files:
                 # Asked for lines changed
-                if test_coverage:
+                lines = test_files.get(path)
+                lines_added = lines[0] if lines else []
+                # A whole file change is already covered by the coverage
+                # report itself
+                if test_coverage and lines_added is not ALL_LINES:
                     lines_changed_not_covered = []
-                    lines = test_files.get(path)
-                    lines_added = lines[-1] if lines else []
-                    lines_covered = test_coverage.get(path)
+                    lines_covered = set(test_coverage.get(path) or [])
                     for line in lines_added:
                         if line not in lines_covered:
                             lines_changed_not_covered.append(str(line))
@@ -246,6 +442,8 @@ class Runner(object):
                         print('    The following lines changed and are not '
                               'covered by tests ({0}%):'.format(cov_perc))
                         print('    ' + ', '.join(lines_changed_not_covered))
+                        self.reporter.add_coverage(
+                            path, lines_changed_not_covered, cov_perc)
 
         print('')
         pytest_tool = self.all_tools.get('pytest')
@@ -263,16 +461,19 @@ class Runner(object):
             else:
                 self.failed_checks.add('pytest')
 
-        for enforce_tool in self.enforce:
-            if enforce_tool in self.failed_checks:
-                msg = "Ciocheck failures in: {0}".format(
-                    repr(self.failed_checks))
-                print('\n\n' + '=' * len(msg))
-                print(msg)
-                print('=' * len(msg))
-                print('')
+        failed_enforced = [enforce_tool for enforce_tool in self.enforce
+                           if enforce_tool in self.failed_checks]
+        self.reporter.finish(self.failed_checks, not failed_enforced)
+
+        if failed_enforced:
+            msg = "Ciocheck failures in: {0}".format(repr(self.failed_checks))
+            print('\n\n' + '=' * len(msg))
+            print(msg)
+            print('=' * len(msg))
+            print('')
+            if self.exit_on_failure:
                 sys.exit(1)
-                break
+            return False
 
         return True
 
@@ -295,12 +496,14 @@ class Runner(object):
                 pass
 
 
-def main():
-    """CLI `Parser for ciocheck`."""
+def create_parser(require_folders=True):
+    """Create the CLI parser for ciocheck."""
     description = 'Run Continuum IO test suite.'
     parser = argparse.ArgumentParser(description=description)
     parser.add_argument(
-        'folders', help='Folders to analyze. Use from repo root.', nargs='+')
+        'folders',
+        help='Folders to analyze. Use from repo root.',
+        nargs='+' if require_folders else '*')
     parser.add_argument(
         '--disable-formatters',
         '-df',
@@ -347,25 +550,78 @@ def main():
         '-c',
         dest='check',
         nargs='+',
-        choices=[
-            'pep8', 'pydocstyle', 'flake8', 'pylint', 'pyformat', 'isort',
-            'yapf', 'autopep8', 'coverage', 'pytest'
-        ],
+        choices=get_registry().names(),
         default=None,
         help='Select tools to run. Default is "pep8"')
     parser.add_argument(
         '--enforce',
         '-e',
         dest='enforce',
-        choices=[
-            'pep8', 'pydocstyle', 'flake8', 'pylint', 'pyformat', 'isort',
-            'yapf', 'autopep8', 'coverage', 'pytest'
-        ],
+        choices=get_registry().names(),
         default=None,
         nargs='+',
         help=('Select tools to enforce. Enforced tools will '
               'fail if a result is obtained. Default is '
               'none.'))
+    parser.add_argument(
+        '--parallel-linters',
+        '-pl',
+        dest='parallel_linters',
+        action='store_true',
+        default=None,
+        help=('Run all selected linters concurrently'))
+    parser.add_argument(
+        '--inprocess-linters',
+        '-il',
+        dest='inprocess_linters',
+        action='store_true',
+        default=None,
+        help=('Run pep8, pydocstyle and flake8 through their python api on '
+              'the worker processes instead of one subprocess per run'))
+    parser.add_argument(
+        '--cache',
+        dest='cache',
+        action='store_true',
+        default=None,
+        help=('Skip files unchanged since the last run by replaying results '
+              'stored in the ".ciocheck_cache" folder'))
+    parser.add_argument(
+        '--watch',
+        '-w',
+        dest='watch',
+        action='store_true',
+        default=False,
+        help=('Keep running and check again the files changed on save'))
+    parser.add_argument(
+        '--format',
+        '-f',
+        dest='report_format',
+        choices=[reporter.name for reporter in REPORTERS],
+        default=TEXT,
+        help=('Define the report format. Machine readable formats are '
+              'written to stdout and other output goes to stderr. Default '
+              'is "text".'))
+    parser.add_argument(
+        '--timings',
+        '-t',
+        dest='timings',
+        action='store_true',
+        default=False,
+        help=('Print the time spent per phase, tool and formatted file'))
+    parser.add_argument(
+        '--timings-file',
+        dest='timings_file',
+        default=None,
+        metavar='TIMINGS_FILE',
+        help=('Save all timed spans as json in TIMINGS_FILE'))
+    parser.add_argument(
+        '--trace',
+        dest='trace',
+        default=None,
+        metavar='TRACE_FILE',
+        help=('Save a Chrome trace of the run in TRACE_FILE, with a lane '
+              'for the runner, each worker and each subprocess. Open it in '
+              'chrome://tracing, Perfetto or speedscope'))
     parser.add_argument(
         '--config',
         '-cf',
@@ -373,20 +629,59 @@ def main():
         default=None,
         help=('Select a config file to use. Default is none.'))
 
-    cli_args = parser.parse_args()
-    root = os.getcwd()
+    parser.add_argument(
+        '--daemon',
+        dest='daemon',
+        action='store_true',
+        default=False,
+        help=('Serve checks on a local socket for "ciocheck-client", keeping '
+              'tools loaded between runs'))
+    return parser
+
+
+def split_paths(root, folders_or_files):
+    """Return absolute `(folders, files)` from CLI paths relative to root."""
     folders = []
     files = []
-    for folder_or_file in cli_args.folders:
-        folder_or_file = os.path.abspath(folder_or_file)
+    for folder_or_file in folders_or_files:
+        folder_or_file = os.path.abspath(os.path.join(root, folder_or_file))
         if os.path.isfile(folder_or_file):
             files.append(folder_or_file)
         elif os.path.isdir(folder_or_file):
             folders.append(folder_or_file)
+    return folders, files
+
+
+def main():
+    """CLI `Parser for ciocheck`."""
+    root = os.getcwd()
+    if '--daemon' in sys.argv[1:]:
+        # The daemon gets the folders to check with every request
+        create_parser(require_folders=False).parse_args()
+        from ciocheck.daemon import serve
+        serve(root)
+        return
+
+    parser = create_parser()
+    cli_args = parser.parse_args()
+
+    report_stream = sys.stdout
+    if cli_args.report_format != TEXT:
+        # Keep stdout for the report only
+        sys.stdout = sys.stderr
 
+    folders, files = split_paths(root, cli_args.folders)
     if folders or files:
-        test = Runner(root, cli_args, folders=folders, files=files)
-        test.run()
+        test = Runner(
+            root,
+            cli_args,
+            folders=folders,
+            files=files,
+            report_stream=report_stream)
+        if cli_args.watch:
+            test.watch()
+        else:
+            test.run()
     elif not folders and not files:
         print('Invalid folders or files!')
 
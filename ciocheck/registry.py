@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# Licensed under the terms of the MIT License
+# (see LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Registry of available tools, loaded only when they run."""
+
+from __future__ import absolute_import, print_function
+
+# Standard library imports
+import importlib
+import sys
+
+# Local imports
+from ciocheck.config import create_tool_config, remove_tool_config
+
+# Tool kinds
+LINTER = 'linter'
+FORMATTER = 'formatter'
+TESTER = 'tester'
+
+# Entry point group where plugins register their `ToolSpec`
+PLUGIN_GROUP = 'ciocheck.tools'
+
+
+class ToolSpec(object):
+    """
+    Metadata of a tool and the location of the class implementing it.
+
+    `target` is a 'package.module:ClassName' string, imported on `load`.
+    Multi formatters (`multi=True`) run in the formatter worker processes.
+    Linters with `api=True` can run in process on the workers. The config
+    file and sections match those of the tool class, so the config can be
+    written without importing it. Plugins expose a spec through an entry
+    point in the 'ciocheck.tools' group, defined in a module that does not
+    import the tool itself.
+    """
+
+    def __init__(self,
+                 name,
+                 kind,
+                 target,
+                 extensions=('py', ),
+                 multi=False,
+                 api=False,
+                 config_file=None,
+                 config_sections=None):
+        """Metadata of a tool and the location of the class implementing it."""
+        self.name = name
+        self.kind = kind
+        self.target = target
+        self.extensions = tuple(extensions)
+        self.multi = multi
+        self.api = api
+        self.config_file = config_file
+        self.config_sections = config_sections
+        self._tool_class = None
+
+    def load(self):
+        """Import and return the tool class."""
+        if self._tool_class is None:
+            module_name, class_name = self.target.split(':')
+            module = importlib.import_module(module_name)
+            self._tool_class = getattr(module, class_name)
+        return self._tool_class
+
+    def create_config(self, cmd_root, config):
+        """Write the config file of the tool, if it has one."""
+        if self.config_file and self.config_sections:
+            create_tool_config(cmd_root, config, self.config_file,
+                               self.config_sections)
+
+    def remove_config(self, cmd_root):
+        """Remove the config file of the tool, if it has one."""
+        if self.config_file and self.config_sections:
+            remove_tool_config(cmd_root, self.config_file)
+
+    def __repr__(self):
+        """Return the representation of the spec."""
+        return 'ToolSpec({0!r}, {1!r}, {2!r})'.format(self.name, self.kind,
+                                                      self.target)
+
+
+BUILTIN_SPECS = [
+    ToolSpec(
+        'pep8',
+        LINTER,
+        'ciocheck.linters:Pep8Linter',
+        api=True,
+        config_file='.pep8',
+        config_sections=[('pep8', 'pep8')]),
+    ToolSpec(
+        'pydocstyle',
+        LINTER,
+        'ciocheck.linters:PydocstyleLinter',
+        api=True,
+        config_file='.pydocstyle',
+        config_sections=[('pydocstyle', 'pydocstyle')]),
+    ToolSpec(
+        'flake8',
+        LINTER,
+        'ciocheck.linters:Flake8Linter',
+        api=True,
+        config_file='.flake8',
+        config_sections=[('flake8', 'flake8')]),
+    ToolSpec(
+        'pylint',
+        LINTER,
+        'ciocheck.linters:PylintLinter',
+        config_file='.pydocstyle',
+        config_sections=[('pydocstyle', 'pydocstyle')]),
+    ToolSpec('pyformat', FORMATTER, 'ciocheck.formatters:PythonFormatter'),
+    ToolSpec(
+        'isort',
+        FORMATTER,
+        'ciocheck.formatters:IsortFormatter',
+        multi=True,
+        config_file='.isort.cfg',
+        config_sections=[('isort', 'settings')]),
+    ToolSpec(
+        'yapf',
+        FORMATTER,
+        'ciocheck.formatters:YapfFormatter',
+        multi=True,
+        config_file='.style.yapf',
+        config_sections=[('yapf:style', 'style')]),
+    ToolSpec(
+        'autopep8',
+        FORMATTER,
+        'ciocheck.formatters:Autopep8Formatter',
+        multi=True,
+        config_file='.autopep8',
+        config_sections=[('autopep8', 'pep8')]),
+    ToolSpec(
+        'coverage',
+        TESTER,
+        'ciocheck.tools:CoverageTool',
+        config_file='.coveragerc',
+        config_sections=[
+            ('coverage:run', 'run'),
+            ('coverage:report', 'report'),
+            ('coverage:html', 'html'),
+            ('coverage:xml', 'xml'),
+        ]),
+    ToolSpec(
+        'pytest',
+        TESTER,
+        'ciocheck.tools:PytestTool',
+        config_file='pytest.ini',
+        config_sections=[('pytest', 'pytest')]),
+]
+
+
+def iter_entry_points(group):
+    """Return the entry points installed for group."""
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:
+        try:
+            import pkg_resources
+        except ImportError:
+            return []
+        return list(pkg_resources.iter_entry_points(group))
+
+    points = entry_points()
+    if hasattr(points, 'select'):
+        return list(points.select(group=group))
+    return list(points.get(group, []))
+
+
+class ToolRegistry(object):
+    """Ordered collection of tool specs, built-in tools first."""
+
+    def __init__(self, specs=None):
+        """Ordered collection of tool specs, built-in tools first."""
+        self._specs = []
+        for spec in specs or []:
+            self.add(spec)
+
+    def add(self, spec):
+        """Add a tool spec, tool names must be unique."""
+        if self.get(spec.name) is not None:
+            print('ciocheck tool "{0}" is already registered'.format(
+                spec.name), file=sys.stderr)
+            return
+        self._specs.append(spec)
+
+    def load_plugins(self, group=PLUGIN_GROUP):
+        """Add the tool specs exposed by installed plugins."""
+        for entry_point in iter_entry_points(group):
+            try:
+                spec = entry_point.load()
+            except Exception as err:
+                print('Could not load ciocheck plugin "{0}": {1}'.format(
+                    entry_point.name, err), file=sys.stderr)
+                continue
+            self.add(spec)
+
+    def get(self, name):
+        """Return the spec of tool `name` or None."""
+        for spec in self._specs:
+            if spec.name == name:
+                return spec
+        return None
+
+    def specs(self, kind=None, names=None):
+        """Return specs of `kind`, restricted to `names` if given."""
+        return [spec for spec in self._specs
+                if (kind is None or spec.kind == kind) and (
+                    names is None or spec.name in names)]
+
+    def names(self, kind=None):
+        """Return the names of tools of `kind`."""
+        return [spec.name for spec in self.specs(kind)]
+
+
+_REGISTRY = []
+
+
+def get_registry():
+    """Return the registry of built-in and plugin tools."""
+    if not _REGISTRY:
+        registry = ToolRegistry(BUILTIN_SPECS)
+        registry.load_plugins()
+        _REGISTRY.append(registry)
+    return _REGISTRY[0]
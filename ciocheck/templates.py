@@ -6,3 +6,225 @@
 # (see LICENSE.txt for details)
 # -----------------------------------------------------------------------------
 """Results templates."""
+
+from __future__ import absolute_import, print_function
+
+# Standard library imports
+import json
+import os
+import sys
+import threading
+
+# Local imports
+from ciocheck.vcs import ALL_LINES
+
+# Report formats
+TEXT = 'text'
+JSON_LINES = 'jsonl'
+SARIF = 'sarif'
+
+SARIF_SCHEMA = ('https://raw.githubusercontent.com/oasis-tcs/sarif-spec/'
+                'master/Schemata/sarif-schema-2.1.0.json')
+
+# Result keys set by formatters
+FORMATTER_KEYS = ('created', 'added-copy', 'added-header', 'diff')
+
+
+def get_added_lines(files, path):
+    """Return the lines added to path, or ALL_LINES if unknown."""
+    # Files are either a list, or a dict of path to
+    # (ADDED_LINES, DELETED_LINES). Results on paths that are not
+    # in files (e.g. a created init) apply to the whole file
+    if isinstance(files, dict) and path in files:
+        return files[path][0]
+    return ALL_LINES
+
+
+def is_reported(result, added_lines):
+    """Return if a result applies to the added lines."""
+    line = int(result.get('line', -1))
+    if line and line in added_lines:
+        return True
+    return any(result.get(key) for key in FORMATTER_KEYS)
+
+
+def make_record(tool_name, result):
+    """Return a json serializable record of a tool result."""
+    record = {'tool': tool_name}
+    record.update(result)
+    for key in ('line', 'column'):
+        if key in record:
+            try:
+                record[key] = int(record[key])
+            except (TypeError, ValueError):
+                pass
+    return record
+
+
+class Reporter(object):
+    """Text report, printed by the runner itself as it is grouped by file."""
+
+    name = TEXT
+
+    def __init__(self, cmd_root, stream=None):
+        """Text report, printed by the runner itself."""
+        self.cmd_root = cmd_root
+        self.stream = stream or sys.stdout
+        # Linters running in parallel report from their own threads
+        self._lock = threading.Lock()
+
+    def add_result(self, tool_name, files, result):
+        """Report a single result of a tool as soon as it is parsed."""
+        pass
+
+    def end_tool(self, tool_name, files):
+        """Report that a tool finished."""
+        pass
+
+    def add_results(self, tool_name, files, results):
+        """Report all the results of a tool once it finished."""
+        for result in results:
+            self.add_result(tool_name, files, result)
+        self.end_tool(tool_name, files)
+
+    def add_coverage(self, path, lines, percentage):
+        """Report lines changed in path that are not covered by tests."""
+        pass
+
+    def finish(self, failed_checks, success):
+        """Report the end of a run."""
+        pass
+
+
+class JsonLinesReporter(Reporter):
+    """Stream one json encoded record per result and line."""
+
+    name = JSON_LINES
+
+    def _write(self, record):
+        """Write a record and flush so consumers get it right away."""
+        with self._lock:
+            self.stream.write(json.dumps(record, sort_keys=True) + '\n')
+            self.stream.flush()
+
+    def add_result(self, tool_name, files, result):
+        """Write a result right away if it applies to the added lines."""
+        if is_reported(result, get_added_lines(files, result['path'])):
+            self._write(make_record(tool_name, result))
+
+    def add_coverage(self, path, lines, percentage):
+        """Write a record for lines changed and not covered by tests."""
+        self._write({
+            'tool': 'coverage',
+            'path': path,
+            'lines': [int(line) for line in lines],
+            'coverage': percentage,
+        })
+
+    def finish(self, failed_checks, success):
+        """Write the summary record."""
+        self._write({
+            'summary': True,
+            'failed': list(sorted(failed_checks)),
+            'success': success,
+        })
+
+
+class SarifReporter(Reporter):
+    """Write a SARIF 2.1.0 log with one run per tool."""
+
+    name = SARIF
+
+    def __init__(self, cmd_root, stream=None):
+        """Write a SARIF 2.1.0 log with one run per tool."""
+        super(SarifReporter, self).__init__(cmd_root, stream=stream)
+        self.runs = []
+
+    def _location(self, path, line=None, column=None):
+        """Return a SARIF location of path, relative to the root."""
+        uri = os.path.relpath(path, self.cmd_root).replace(os.sep, '/')
+        location = {'artifactLocation': {'uri': uri}}
+        if line:
+            region = {'startLine': int(line)}
+            if column:
+                region['startColumn'] = max(int(column), 1)
+            location['region'] = region
+        return {'physicalLocation': location}
+
+    def _result(self, tool_name, result):
+        """Return a SARIF result of a tool result."""
+        if result.get('diff'):
+            text = 'File changed by {0}:\n{1}'.format(tool_name,
+                                                      result['diff'])
+        elif result.get('created'):
+            text = '__init__ file created.'
+        elif result.get('added-copy') or result.get('added-header'):
+            text = 'Added header.'
+        else:
+            text = result.get('message', '')
+
+        return {
+            'ruleId': result.get('type') or tool_name,
+            'level': 'warning',
+            'message': {'text': text},
+            'locations': [self._location(
+                result['path'], result.get('line'), result.get('column'))],
+        }
+
+    def _run(self, tool_name):
+        """Return the SARIF run of a tool, created on first use."""
+        with self._lock:
+            for run in self.runs:
+                if run['tool']['driver']['name'] == tool_name:
+                    return run
+            run = {'tool': {'driver': {'name': tool_name}}, 'results': []}
+            self.runs.append(run)
+            return run
+
+    def add_result(self, tool_name, files, result):
+        """Keep a result if it applies to the added lines."""
+        if is_reported(result, get_added_lines(files, result['path'])):
+            self._run(tool_name)['results'].append(
+                self._result(tool_name, result))
+
+    def end_tool(self, tool_name, files):
+        """Make sure the log holds a run of the tool, even if clean."""
+        self._run(tool_name)
+
+    def add_coverage(self, path, lines, percentage):
+        """Keep a result for lines changed and not covered by tests."""
+        text = ('The following lines changed and are not covered by tests '
+                '({0}%): {1}').format(percentage, ', '.join(lines))
+        result = {
+            'ruleId': 'coverage',
+            'level': 'warning',
+            'message': {'text': text},
+            'locations': [self._location(path)],
+        }
+        self._run('coverage')['results'].append(result)
+
+    def finish(self, failed_checks, success):
+        """Write the log of the run."""
+        log = {
+            '$schema': SARIF_SCHEMA,
+            'version': '2.1.0',
+            'runs': self.runs,
+        }
+        self.stream.write(json.dumps(log, indent=2, sort_keys=True) + '\n')
+        self.stream.flush()
+        self.runs = []
+
+
+REPORTERS = [
+    Reporter,
+    JsonLinesReporter,
+    SarifReporter,
+]
+
+
+def get_reporter(name, cmd_root, stream=None):
+    """Return the reporter for format `name`."""
+    for reporter_class in REPORTERS:
+        if reporter_class.name == name:
+            return reporter_class(cmd_root, stream=stream)
+    raise ValueError('Unknown report format: {0}'.format(name))
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# May be copied and distributed freely only as part of an Anaconda or
+# Miniconda installation.
+# -----------------------------------------------------------------------------
+"""Test result cache."""
+
+# Local imports
+from ciocheck.cache import ResultCache
+from ciocheck.linters import Flake8Linter
+
+
+def test_cache_roundtrip(tmpdir):
+    """Test results are replayed until the file content changes."""
+    path = tmpdir.join('module.py')
+    path.write('import os\n')
+    cache = ResultCache(str(tmpdir))
+    linter = Flake8Linter(str(tmpdir))
+
+    key = cache.key(linter, str(path))
+    assert cache.get(key) is None
+    cache.set(key, [{'path': str(path), 'line': 1}])
+    assert cache.get(key) == [{'path': str(path), 'line': 1}]
+
+    path.write('import sys\n')
+    assert cache.key(linter, str(path)) != key
+
+
+def test_cache_clear(tmpdir):
+    """Test config changes between runs give new keys once cleared."""
+    path = tmpdir.join('module.py')
+    path.write('import os\n')
+    config = tmpdir.join('.flake8')
+    config.write('[flake8]\nmax-line-length = 79\n')
+    cache = ResultCache(str(tmpdir))
+    linter = Flake8Linter(str(tmpdir))
+    key = cache.key(linter, str(path))
+
+    config.write('[flake8]\nmax-line-length = 100\n')
+    assert cache.key(linter, str(path)) == key
+    cache.clear()
+    assert cache.key(linter, str(path)) != key
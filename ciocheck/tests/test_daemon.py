@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# May be copied and distributed freely only as part of an Anaconda or
+# Miniconda installation.
+# -----------------------------------------------------------------------------
+"""Test the check server."""
+
+# Standard library imports
+import sys
+
+# Third party imports
+import pytest
+
+# Local imports
+from ciocheck.daemon import CheckServer
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='Needs unix sockets')
+def test_parser_errors_answered(tmpdir, monkeypatch):
+    """Test parser errors are sent back instead of printed by the server."""
+    monkeypatch.chdir(str(tmpdir))
+    server = CheckServer(str(tmpdir))
+    try:
+        output, errors, code = server.run(str(tmpdir),
+                                          ['.', '--unknown-flag'])
+    finally:
+        server.server_close()
+    assert code == 2
+    assert output == ''
+    assert 'unrecognized arguments: --unknown-flag' in errors
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# May be copied and distributed freely only as part of an Anaconda or
+# Miniconda installation.
+# -----------------------------------------------------------------------------
+"""Test formatters."""
+
+# Standard library imports
+import os
+import subprocess
+import sys
+
+# Local imports
+from ciocheck.formatters import Autopep8Formatter, YapfFormatter
+
+
+def test_autopep8_options(tmpdir, monkeypatch):
+    """Test autopep8 options are parsed once and passed to fix_code."""
+    tmpdir.join('.autopep8').write('[pep8]\nignore = E225,E226\n'
+                                   'exclude = build,dist\n')
+    # Options are read through class attributes, restored after the test
+    monkeypatch.setattr(
+        Autopep8Formatter, 'cmd_root', str(tmpdir), raising=False)
+    monkeypatch.setattr(Autopep8Formatter, '_options_key', None)
+    monkeypatch.setattr(Autopep8Formatter, '_options', None)
+    _, new_contents, _ = Autopep8Formatter.format_string('x=1\n')
+    assert new_contents == 'x=1\n'
+
+    options = Autopep8Formatter._options
+    Autopep8Formatter.get_options()
+    assert Autopep8Formatter._options is options
+    assert options.ignore == ['E225', 'E226']
+
+
+def test_yapf_style(tmpdir, monkeypatch):
+    """Test predefined yapf styles are passed by name, others preloaded."""
+    monkeypatch.setattr(
+        YapfFormatter, 'cmd_root', str(tmpdir), raising=False)
+    monkeypatch.setattr(YapfFormatter, '_style_key', None)
+    style_file = tmpdir.join('.style.yapf')
+    style_file.write('[style]\nbased_on_style = pep8\ncolumn_limit = 79\n')
+    assert YapfFormatter.load_style() == 'pep8'
+
+    style_file.write('[style]\nbased_on_style = pep8\ncolumn_limit = 100\n')
+    # Make sure the modification time changes
+    style_file.setmtime(style_file.mtime() + 10)
+    assert YapfFormatter.load_style() is None
+    _, new_contents, _ = YapfFormatter.format_string('x = [1,2]\n')
+    assert new_contents == 'x = [1, 2]\n'
+
+
+def test_worker_preload():
+    """Test warm workers import the selected formatters before any task."""
+    code = ('import sys; from ciocheck.format_task import preload_formatters; '
+            'preload_formatters(); '
+            'print(",".join(m for m in ("isort", "yapf", "autopep8") '
+            'if m in sys.modules))')
+    env = os.environ.copy()
+    env['CIOCHECK_CHECK'] = str(['isort', 'yapf'])
+    output = subprocess.check_output([sys.executable, '-c', code], env=env)
+    assert output.decode().strip() == 'isort,yapf'
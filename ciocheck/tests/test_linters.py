@@ -7,8 +7,16 @@
 # -----------------------------------------------------------------------------
 """Test pytest runners."""
 
+# Standard library imports
+import sys
+
+# Third party imports
+import pytest
+
 # Local imports
-from ciocheck.linters import Flake8Linter, Pep8Linter
+from ciocheck.cache import ResultCache
+from ciocheck.linters import Flake8Linter, Pep8Linter, PydocstyleLinter
+from ciocheck.utils import PROCESS_RUNNER, ProcessError
 
 
 def test_true():
@@ -21,3 +29,66 @@ def test_false():
     """Mock test for checking ciocheck is working."""
     linter = Pep8Linter('')
     assert linter.name == 'pep8'
+
+
+def test_parse_regex_records():
+    """Test multi line records are parsed incrementally."""
+    linter = PydocstyleLinter('')
+    lines = iter(['./a.py:1 at module level:\n',
+                  '        D100: Missing docstring in public module\n'])
+    results = list(linter._iter_parse_regex(lines))
+    assert results[0]['path'] == './a.py'
+    assert results[0]['type'] == 'D100'
+
+
+def test_pep8_run_api(tmpdir):
+    """Test the in process pep8 results match the command line output."""
+    path = tmpdir.join('a.py')
+    path.write('x=1\n')
+    linter = Pep8Linter(str(tmpdir))
+    results = linter.run_api([str(path)])
+    assert results == [{
+        'path': str(path),
+        'line': '1',
+        'column': '2',
+        'type': 'E225',
+        'message': 'missing whitespace around operator',
+    }]
+
+
+def test_flake8_shard_args(tmpdir, monkeypatch):
+    """Test sharded flake8 runs do not start their own jobs."""
+    paths = [str(tmpdir.join(name)) for name in ('a.py', 'b.py')]
+    for path in paths:
+        with open(path, 'w') as file_obj:
+            file_obj.write('x = 1\n')
+    commands = []
+    monkeypatch.setattr('ciocheck.linters.cpu_count', lambda: 2)
+    monkeypatch.setattr('ciocheck.linters.iter_command',
+                        lambda args, stderr: commands.append(args) or [])
+    linter = Flake8Linter(str(tmpdir))
+    linter.shard = True
+    list(linter._iter_run(paths))
+    assert sorted(commands) == [['flake8', '--jobs=1', paths[0]],
+                                ['flake8', '--jobs=1', paths[1]]]
+
+
+def test_timed_out_run_not_cached(tmpdir, monkeypatch):
+    """Test partial results of a killed linter are not cached."""
+    path = tmpdir.join('a.py')
+    path.write('x=1\n')
+    script = ("import sys, time\n"
+              "print(sys.argv[1] + ':1:2: E225 missing whitespace')\n"
+              "sys.stdout.flush()\n"
+              "time.sleep(30)\n")
+    monkeypatch.setattr(PROCESS_RUNNER, 'timeout', 0.5)
+    linter = Flake8Linter(str(tmpdir))
+    linter.command = (sys.executable, '-c', script)
+    linter.cache = ResultCache(str(tmpdir))
+
+    results = []
+    with pytest.raises(ProcessError):
+        for result in linter.iter_results([str(path)]):
+            results.append(result)
+    assert len(results) == 1
+    assert linter.cache.get(linter.cache.key(linter, str(path))) is None
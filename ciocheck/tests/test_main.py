@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# May be copied and distributed freely only as part of an Anaconda or
+# Miniconda installation.
+# -----------------------------------------------------------------------------
+"""Test the command line entry point."""
+
+# Standard library imports
+from collections import OrderedDict
+import json
+import os
+import subprocess
+import sys
+
+# Third party imports
+import pytest
+
+# Local imports
+from ciocheck.linters import Flake8Linter
+from ciocheck.main import Runner, create_parser
+from ciocheck.utils import PROCESS_RUNNER
+
+HEAVY_MODULES = ['autopep8', 'isort', 'pytest', 'pytest_cov', 'yapf']
+
+
+def test_lazy_imports():
+    """Test importing the CLI does not import formatters or pytest."""
+    code = ('import sys, ciocheck.main; '
+            'print(",".join(m for m in {0} if m in sys.modules))')
+    output = subprocess.check_output(
+        [sys.executable, '-c', code.format(HEAVY_MODULES)])
+    assert output.decode().strip() == ''
+
+
+# Print a result, then wait to be released before exiting
+SLOW_LINTER = """
+import os, sys, time
+sys.stdout.write('a.py:1:1: E225 missing whitespace around operator\\n')
+sys.stdout.flush()
+release, done = sys.argv[1:3]
+for _ in range(500):
+    if os.path.exists(release):
+        break
+    time.sleep(0.01)
+open(done, 'w').close()
+"""
+
+
+class ReleaseStream(object):
+    """Stream recording if the linter was still running on each write."""
+
+    def __init__(self, release, done):
+        """Stream recording if the linter was still running."""
+        self.release = release
+        self.done = done
+        self.running = []
+        self.lines = []
+
+    def write(self, text):
+        """Record the text and release the linter."""
+        self.running.append(not os.path.exists(self.done))
+        self.lines.append(text)
+        open(self.release, 'w').close()
+
+    def flush(self):
+        """Nothing to flush."""
+        pass
+
+
+def test_linter_results_streamed(tmpdir):
+    """Test linter results reach the reporter before the linter exits."""
+    release, done = str(tmpdir.join('release')), str(tmpdir.join('done'))
+    stream = ReleaseStream(release, done)
+    cli_args = create_parser().parse_args(['-f', 'jsonl', str(tmpdir)])
+    runner = Runner(
+        str(tmpdir), cli_args, folders=[str(tmpdir)], report_stream=stream)
+
+    linter = Flake8Linter(str(tmpdir))
+    linter.command = (sys.executable, '-c', SLOW_LINTER, release, done)
+    results = runner.run_linter(linter, ['a.py'])
+
+    assert len(results) == 1
+    assert stream.running == [True]
+    assert json.loads(stream.lines[0])['type'] == 'E225'
+
+
+class DiffFileManager(object):
+    """File manager returning a fixed diff."""
+
+    def __init__(self, files):
+        """File manager returning a fixed diff."""
+        self.files = files
+        self.timings = None
+
+    def get_files(self, **kwargs):
+        """Return the diff for the lines file mode."""
+        assert kwargs['file_mode'] == 'lines'
+        return self.files
+
+
+def test_watch_files_keep_lines(tmpdir):
+    """Test saved files keep their changed lines in watch mode."""
+    saved, other = str(tmpdir.join('a.py')), str(tmpdir.join('b.py'))
+    files = OrderedDict([(saved, ([3], [])), (other, ([1], []))])
+    cli_args = create_parser().parse_args(['-fm', 'lines', str(tmpdir)])
+    runner = Runner(str(tmpdir), cli_args, file_manager=DiffFileManager(files))
+    runner.watch_paths = [saved]
+    assert runner.get_files(('py', )) == OrderedDict([(saved, ([3], []))])
+
+
+def test_parser_timings_and_folders():
+    """Test folders are required and not taken by the timings flag."""
+    cli_args = create_parser().parse_args(['-t', 'pkg'])
+    assert cli_args.timings is True
+    assert cli_args.folders == ['pkg']
+
+    with pytest.raises(SystemExit):
+        create_parser().parse_args(['-t'])
+    cli_args = create_parser(require_folders=False).parse_args(['--daemon'])
+    assert cli_args.folders == []
+
+
+def test_failed_linter_marked(tmpdir, monkeypatch):
+    """Test a linter killed on timeout fails its check."""
+    cli_args = create_parser().parse_args([str(tmpdir)])
+    runner = Runner(str(tmpdir), cli_args, folders=[str(tmpdir)])
+    monkeypatch.setattr(PROCESS_RUNNER, 'timeout', 0.5)
+    linter = Flake8Linter(str(tmpdir))
+    linter.command = (sys.executable, '-c', 'import time; time.sleep(30)')
+    assert runner.run_linter(linter, ['a.py']) == []
+    assert runner.failed_checks == set(['flake8'])
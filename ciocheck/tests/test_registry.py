@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# May be copied and distributed freely only as part of an Anaconda or
+# Miniconda installation.
+# -----------------------------------------------------------------------------
+"""Test the tool registry."""
+
+# Standard library imports
+import sys
+
+# Local imports
+from ciocheck.config import CustomConfigParser
+from ciocheck.registry import (BUILTIN_SPECS, FORMATTER, LINTER, PLUGIN_GROUP,
+                               ToolRegistry, ToolSpec)
+
+PLUGIN_SPEC = """
+from ciocheck.registry import LINTER, ToolSpec
+
+SPEC = ToolSpec('mylinter', LINTER, 'mylinter_tool:MyLinter')
+"""
+PLUGIN_TOOL = """
+from ciocheck.linters import Linter
+
+
+class MyLinter(Linter):
+    name = 'mylinter'
+    extensions = ('py', )
+"""
+ENTRY_POINTS = """
+[{group}]
+mylinter = mylinter_spec:SPEC
+""".format(group=PLUGIN_GROUP)
+
+
+def test_builtin_specs():
+    """Test built-in metadata matches the tool classes."""
+    for spec in BUILTIN_SPECS:
+        tool_class = spec.load()
+        assert tool_class.name == spec.name
+        assert tuple(tool_class.extensions) == spec.extensions
+        assert getattr(tool_class, 'api', False) == spec.api
+        assert tool_class.config_file == spec.config_file
+        assert tool_class.config_sections == spec.config_sections
+
+
+def test_spec_config(tmpdir):
+    """Test a spec writes and removes the tool config without loading it."""
+    config = CustomConfigParser()
+    config.add_section('yapf:style')
+    config.set('yapf:style', 'based_on_style', 'pep8')
+    spec = ToolSpec('yapf', FORMATTER, 'missing.module:Missing', multi=True,
+                    config_file='.style.yapf',
+                    config_sections=[('yapf:style', 'style')])
+    spec.create_config(str(tmpdir), config)
+    assert tmpdir.join('.style.yapf').read().startswith('[style]')
+    spec.remove_config(str(tmpdir))
+    assert not tmpdir.join('.style.yapf').check()
+
+
+def test_load_plugins(tmpdir, monkeypatch):
+    """Test plugins register metadata and load the tool class lazily."""
+    tmpdir.join('mylinter_spec.py').write(PLUGIN_SPEC)
+    tmpdir.join('mylinter_tool.py').write(PLUGIN_TOOL)
+    dist_info = tmpdir.mkdir('mylinter-0.1.dist-info')
+    dist_info.join('METADATA').write('Name: mylinter\nVersion: 0.1\n')
+    dist_info.join('entry_points.txt').write(ENTRY_POINTS)
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    registry = ToolRegistry(BUILTIN_SPECS)
+    registry.load_plugins()
+    assert registry.names(LINTER)[-1] == 'mylinter'
+    assert 'mylinter_tool' not in sys.modules
+
+    spec = registry.get('mylinter')
+    assert spec.load().name == 'mylinter'
+    assert 'mylinter_tool' in sys.modules
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# May be copied and distributed freely only as part of an Anaconda or
+# Miniconda installation.
+# -----------------------------------------------------------------------------
+"""Test report templates."""
+
+# Standard library imports
+import json
+
+# Third party imports
+from six.moves import cStringIO as StringIO
+
+# Local imports
+from ciocheck.templates import get_reporter
+from ciocheck.vcs import LineRanges
+
+RESULTS = [
+    {'path': '/root/a.py', 'line': '1', 'column': '5', 'type': 'E225',
+     'message': 'missing whitespace around operator'},
+    {'path': '/root/a.py', 'line': '7', 'column': '1', 'type': 'F401',
+     'message': "'os' imported but unused"},
+]
+
+
+def make_files():
+    """Return files where only line 7 of a.py was added."""
+    return {'/root/a.py': (LineRanges([(7, 7)]), LineRanges())}
+
+
+def test_jsonl_reporter():
+    """Test records are written for results on added lines only."""
+    stream = StringIO()
+    reporter = get_reporter('jsonl', '/root', stream=stream)
+    reporter.add_results('flake8', make_files(), RESULTS)
+    reporter.finish(set(['flake8']), False)
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert records[0]['type'] == 'F401'
+    assert records[0]['line'] == 7
+    assert records[1] == {'summary': True, 'failed': ['flake8'],
+                          'success': False}
+
+
+def test_sarif_reporter():
+    """Test a SARIF log holds a run per tool with relative locations."""
+    stream = StringIO()
+    reporter = get_reporter('sarif', '/root', stream=stream)
+    reporter.add_results('flake8', make_files(), RESULTS)
+    reporter.add_results('pep8', make_files(), [])
+    reporter.finish(set(['flake8']), False)
+
+    log = json.loads(stream.getvalue())
+    assert log['version'] == '2.1.0'
+    flake8_run, pep8_run = log['runs']
+    assert flake8_run['tool']['driver']['name'] == 'flake8'
+    assert pep8_run['results'] == []
+    # Only the result on the added line is reported
+    assert len(flake8_run['results']) == 1
+    result = flake8_run['results'][0]
+    assert result['ruleId'] == 'F401'
+    location = result['locations'][0]['physicalLocation']
+    assert location['artifactLocation']['uri'] == 'a.py'
+    assert location['region'] == {'startLine': 7, 'startColumn': 1}
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# May be copied and distributed freely only as part of an Anaconda or
+# Miniconda installation.
+# -----------------------------------------------------------------------------
+"""Test utilities."""
+
+# Local imports
+from ciocheck.utils import FileContents, Timings, balanced_shards, get_files
+
+
+def test_balanced_shards(tmpdir):
+    """Test shards are balanced by file size and keep path order."""
+    paths = []
+    for name, size in [('a', 10), ('b', 50), ('c', 20), ('d', 30)]:
+        path = tmpdir.join(name + '.py')
+        path.write('x' * size)
+        paths.append(str(path))
+
+    shards = balanced_shards(paths, 2)
+    assert sorted(sum(shards, [])) == sorted(paths)
+    assert [[p[-4] for p in shard] for shard in shards] == [['a', 'b'],
+                                                            ['c', 'd']]
+
+
+def test_get_files(tmpdir):
+    """Test hidden, ignored and non matching entries are skipped."""
+    for name in ['a.py', 'b.txt', '.c.py', 'd.pyc', 'sub/e.py', '.git/f.py',
+                 'build/g.py', 'sub/deep/h.py']:
+        tmpdir.join(name).write('', ensure=True)
+
+    for workers in [1, 4]:
+        files = get_files([str(tmpdir)], exts=('py', ), workers=workers)
+        names = [f[len(str(tmpdir)) + 1:].replace('\\', '/') for f in files]
+        assert names == ['a.py', 'sub/deep/h.py', 'sub/e.py']
+
+
+def test_file_contents(tmpdir):
+    """Test contents are kept after writes and read again on changes."""
+    path = tmpdir.join('a.py')
+    path.write('a = 1\r\n')
+    contents = FileContents()
+    assert contents.read(str(path)) == 'a = 1\n'
+    assert contents.read(str(path), universal_newlines=False) == 'a = 1\r\n'
+
+    contents.write(str(path), u'b = 2\n', 'utf-8')
+    assert contents.lines(str(path)) == ['b = 2\n']
+
+    path.write('c = 33\n')
+    assert contents.read(str(path)) == 'c = 33\n'
+
+
+def test_timings():
+    """Test spans are summarized by category and name."""
+    timings = Timings()
+    with timings.span('flake8', 'tool'):
+        pass
+    timings.add('yapf', 'format', 0, 0.5, lane='worker 1',
+                args={'path': 'a.py'})
+    timings.add('yapf', 'format', 0, 0.25, lane='worker 2',
+                args={'path': 'b.py'})
+
+    rows = timings.summary()
+    assert rows[0] == ('format', 'yapf', 2, 0.75, 0.5)
+    assert rows[1][:3] == ('tool', 'flake8', 1)
+    assert timings.slowest_paths('format') == [('a.py', 0.5), ('b.py', 0.25)]
+
+
+def test_timings_trace():
+    """Test spans are exported as Chrome trace events, one lane each."""
+    timings = Timings()
+    timings.add('flake8', 'tool', timings.start + 0.5, 0.25)
+    timings.add('yapf', 'format', timings.start + 0.25, 0.5,
+                lane='worker 1', args={'path': 'a.py'})
+
+    trace = timings.to_trace()
+    events = [event for event in trace['traceEvents'] if event['ph'] == 'X']
+    names = dict((event['tid'], event['args']['name'])
+                 for event in trace['traceEvents']
+                 if event['name'] == 'thread_name')
+    assert names == {1: 'main', 2: 'worker 1'}
+    assert [event['name'] for event in events] == ['yapf', 'flake8']
+    assert events[0]['ts'] == 250000
+    assert events[0]['dur'] == 500000
+    assert events[0]['tid'] == 2
+    assert events[0]['args'] == {'path': 'a.py'}
+    assert events[1]['tid'] == 1
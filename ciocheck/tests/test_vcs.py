@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# May be copied and distributed freely only as part of an Anaconda or
+# Miniconda installation.
+# -----------------------------------------------------------------------------
+"""Test version control helpers."""
+
+# Standard library imports
+import os
+
+# Local imports
+from ciocheck.config import ALL_FILES
+from ciocheck.files import FileManager
+from ciocheck.utils import run_command
+from ciocheck.vcs import ALL_LINES, GitDiffTool, LineRanges
+
+
+def test_line_ranges():
+    """Test intervals are merged and membership is exact."""
+    lines = LineRanges([(10, 12), (1, 3), (4, 5)])
+    assert lines.ranges == [(1, 5), (10, 12)]
+    assert 5 in lines
+    assert 6 not in lines
+    assert 12 in lines
+    assert 13 not in lines
+    assert len(lines) == 8
+    assert list(lines) == [1, 2, 3, 4, 5, 10, 11, 12]
+
+
+def test_parse_hunk_headers():
+    """Test changed lines are read from the -U0 hunk headers."""
+    diff_tool = GitDiffTool('')
+    added, deleted = diff_tool._parse_lines([
+        '@@ -1 +1,2 @@ def foo():',
+        '@@ -10,3 +11,0 @@',
+        '@@ -20,0 +18 @@',
+    ])
+    assert added.ranges == [(1, 2), (18, 18)]
+    assert deleted.ranges == [(1, 1), (10, 12)]
+
+
+def test_all_lines():
+    """Test the whole file marker includes lines past any fixed limit."""
+    assert 1 in ALL_LINES
+    assert 10 ** 6 in ALL_LINES
+    assert -1 not in ALL_LINES
+
+
+def test_parse_source_line():
+    """Test paths with spaces, quotes and non ascii characters."""
+    diff_tool = GitDiffTool('')
+    parse = diff_tool._parse_source_line
+    assert parse('diff --git a/pkg/a b.py b/pkg/a b.py') == 'pkg/a b.py'
+    assert parse(u'diff --git a/pkg/\xe9.py b/pkg/\xe9.py') == u'pkg/\xe9.py'
+    assert parse(r'diff --git "a/pkg/\303\251 \"q\".py" '
+                 r'"b/pkg/\303\251 \"q\".py"') == u'pkg/\xe9 "q".py'
+    assert parse(r'diff --git "a/t\tb.py" "b/t\tb.py"') == 't\tb.py'
+    assert parse('diff --cc pkg/c d.py') == 'pkg/c d.py'
+
+
+def test_all_files_untracked(tmpdir, monkeypatch):
+    """Test untracked files are listed and ignored files are skipped."""
+    path = str(tmpdir)
+    run_command(['git', 'init', '-q'], cwd=path)
+    tmpdir.join('.gitignore').write('ignored.py\n')
+    tmpdir.join('tracked.py').write('')
+    tmpdir.join('deleted.py').write('')
+    run_command(['git', 'add', 'tracked.py', 'deleted.py'], cwd=path)
+    tmpdir.join('deleted.py').remove()
+    tmpdir.join('new file.py').write('')
+    tmpdir.join('ignored.py').write('')
+
+    names = [os.path.basename(p) for p in GitDiffTool(path).all_files()]
+    assert names == ['new file.py', 'tracked.py']
+
+    # The listing runs once and is filtered for each extension set
+    file_manager = FileManager(folders=[path])
+    calls = []
+    all_files = file_manager.diff_tool.all_files
+
+    def counted_all_files():
+        calls.append(None)
+        return all_files()
+
+    monkeypatch.setattr(file_manager.diff_tool, 'all_files', counted_all_files)
+    python_files = file_manager.get_files(
+        file_mode=ALL_FILES, extensions=('py', ))
+    file_manager.get_files(file_mode=ALL_FILES, extensions=('cfg', ))
+    assert len(calls) == 1
+    assert [os.path.basename(p) for p in python_files] == [
+        'new file.py', 'tracked.py']
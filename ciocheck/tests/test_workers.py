@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# May be copied and distributed freely only as part of an Anaconda or
+# Miniconda installation.
+# -----------------------------------------------------------------------------
+"""Test the worker pool."""
+
+# Standard library imports
+import subprocess
+import sys
+
+# Local imports
+from ciocheck.utils import PROCESS_RUNNER
+from ciocheck.workers import WorkerPool
+
+# Answer each task with itself, hanging on tasks asking to sleep
+ECHO_WORKER = """
+import json, sys, time
+for line in iter(sys.stdin.readline, ''):
+    task = json.loads(line)
+    if task.get('sleep'):
+        time.sleep(task['sleep'])
+    sys.stdout.write(json.dumps({'result': task, 'timings': []}) + '\\n')
+    sys.stdout.flush()
+"""
+
+
+class EchoPool(WorkerPool):
+    """Pool of workers echoing their tasks."""
+
+    def _start_worker(self):
+        """Start an echo worker."""
+        return PROCESS_RUNNER.popen(
+            [sys.executable, '-c', ECHO_WORKER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            universal_newlines=True)
+
+
+def test_hung_worker_replaced(tmpdir, monkeypatch):
+    """Test a task over the timeout is dropped and its worker replaced."""
+    monkeypatch.setattr(PROCESS_RUNNER, 'timeout', 0.5)
+    pool = EchoPool(str(tmpdir), [], workers=1)
+    try:
+        results = pool.map([{'sleep': 30}, {'path': 'a.py'}])
+        assert results == [None, {'path': 'a.py'}]
+        assert len(pool.processes) == 1
+    finally:
+        pool.close()
@@ -14,13 +14,12 @@ import json
 import os
 
 # Third party imports
-from pytest_cov.plugin import CoverageError
 from six import PY2
 from six.moves import configparser
-import pytest
 
 # Local imports
-from ciocheck.config import COVERAGE_CONFIGURATION_FILE
+from ciocheck.config import (COVERAGE_CONFIGURATION_FILE, create_tool_config,
+                             remove_tool_config)
 from ciocheck.utils import ShortOutput, cpu_count
 
 
@@ -33,6 +32,9 @@ class Tool(object):
 
     command = None
 
+    # Result cache (ciocheck.cache.ResultCache), set by the runner
+    cache = None
+
     # Config
     config_file = None  # '.validconfigfilename'
     config_sections = None  # (('ciocheck:section', 'section'))
@@ -48,19 +50,18 @@ class Tool(object):
         self.config = config
 
         if self.config_file and self.config_sections:
-            new_config = configparser.ConfigParser()
-            new_config_file = os.path.join(self.cmd_root, self.config_file)
-
-            for (cio_config_section, config_section) in self.config_sections:
-                if config.has_section(cio_config_section):
-                    items = config.items(cio_config_section)
-                    new_config.add_section(config_section)
-
-                    for option, value in items:
-                        new_config.set(config_section, option, value)
+            create_tool_config(self.cmd_root, config, self.config_file,
+                               self.config_sections)
 
-            with open(new_config_file, 'w') as file_obj:
-                new_config.write(file_obj)
+    @classmethod
+    def config_signature(cls):
+        """Return config file path and modification time, None if missing."""
+        config_path = os.path.join(cls.cmd_root, cls.config_file)
+        try:
+            mtime = os.path.getmtime(config_path)
+        except (IOError, OSError):
+            mtime = None
+        return config_path, mtime
 
     @classmethod
     def make_config_dictionary(cls):
@@ -97,9 +98,7 @@ class Tool(object):
     def remove_config(cls, path):
         """Remove config file."""
         if cls.config_file and cls.config_sections:
-            remove_file = os.path.join(path, cls.config_file)
-            if os.path.isfile(remove_file):
-                os.remove(remove_file)
+            remove_tool_config(path, cls.config_file)
 
     def run(self, paths):
         """Run the tool."""
@@ -204,6 +203,9 @@ class PytestTool(Tool):
 
     def run(self, paths):
         """Run pytest test suite."""
+        from pytest_cov.plugin import CoverageError
+        import pytest
+
         cmd = paths + self.pytest_args
         print(cmd)
 
@@ -266,12 +268,6 @@ class PytestTool(Tool):
             os.remove(remove_file)
 
 
-TOOLS = [
-    CoverageTool,
-    PytestTool,
-]
-
-
 def test():
     """Main local test."""
     pass
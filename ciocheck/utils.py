@@ -11,19 +11,20 @@ from __future__ import absolute_import, print_function
 
 # Standard library imports
 from collections import OrderedDict
-from copy import deepcopy
+from contextlib import contextmanager
 import codecs
-import cProfile
 import difflib
 import errno
 import os
-import pstats
 import subprocess
 import sys
+import threading
+import time
 import uuid
 
 # Third party imports
 from six.moves import cStringIO as StringIO
+from six.moves import queue
 
 # Local imports
 from ciocheck.config import DEFAULT_IGNORE_EXTENSIONS, DEFAULT_IGNORE_FOLDERS
@@ -34,6 +35,8 @@ class Profiler(object):
 
     def __init__(self):
         """Context manager profiler."""
+        import cProfile
+
         self._profiler = cProfile.Profile()
 
     def __enter__(self):
@@ -42,12 +45,148 @@ class Profiler(object):
 
     def __exit__(self, type_, value, traceback):
         """Disable profiler and print stats."""
+        import pstats
+
         self._profiler.disable()
         profile_stat = pstats.Stats(
             self._profiler, stream=sys.stdout).sort_stats('cumulative')
         profile_stat.print_stats()
 
 
+class Timings(object):
+    """
+    Timed spans of a run, grouped by category for the summary.
+
+    Each span has a name, a category (e.g. 'phase', 'tool' or 'format'),
+    a start time since the epoch, a duration in seconds, the lane (process
+    or thread) it ran on and optional arguments, like the file path.
+    """
+
+    def __init__(self, lane='main'):
+        """Timed spans of a run, grouped by category for the summary."""
+        self.lane = lane
+        self.start = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, category, start, duration, lane=None, args=None):
+        """Add a span that started at `start` and lasted `duration`."""
+        span = {
+            'name': name,
+            'category': category,
+            'start': start,
+            'duration': duration,
+            'lane': lane or self.lane,
+            'args': args or {},
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    def extend(self, spans):
+        """Add spans measured elsewhere, e.g. in a worker process."""
+        with self._lock:
+            self.spans.extend(spans)
+
+    @contextmanager
+    def span(self, name, category='phase', lane=None, **args):
+        """Time the enclosed block."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, time.time() - start, lane, args)
+
+    def summary(self):
+        """Return (category, name, calls, total, max) rows by total time."""
+        groups = OrderedDict()
+        for span in self.spans:
+            key = (span['category'], span['name'])
+            calls, total, longest = groups.get(key, (0, 0.0, 0.0))
+            groups[key] = (calls + 1, total + span['duration'],
+                           max(longest, span['duration']))
+        rows = [key + value for key, value in groups.items()]
+        return sorted(rows, key=lambda row: (row[0], -row[3]))
+
+    def slowest_paths(self, category, count=5):
+        """Return the paths with the longest total time in `category`."""
+        totals = {}
+        for span in self.spans:
+            path = span['args'].get('path')
+            if span['category'] == category and path:
+                totals[path] = totals.get(path, 0.0) + span['duration']
+        paths = sorted(totals.items(), key=lambda item: -item[1])
+        return paths[:count]
+
+    def print_summary(self, cmd_root=''):
+        """Print a table of the time spent per category and name."""
+        msg = 'Timings ({0:.2f} s)'.format(time.time() - self.start)
+        print('\n' + msg)
+        print('-' * len(msg))
+        template = '  {0:<10} {1:<20} {2:>6} {3:>10} {4:>10} {5:>10}'
+        print(template.format('Category', 'Name', 'Calls', 'Total (s)',
+                              'Mean (ms)', 'Max (ms)'))
+        for category, name, calls, total, longest in self.summary():
+            mean = 1000 * total / calls
+            print(template.format(category, name, calls,
+                                  '{0:.3f}'.format(total),
+                                  '{0:.1f}'.format(mean),
+                                  '{0:.1f}'.format(1000 * longest)))
+
+        slowest = self.slowest_paths('format')
+        if slowest:
+            print('\n  Slowest files to format')
+            for path, total in slowest:
+                print('  {0:>10.1f} ms  {1}'.format(
+                    1000 * total, path.replace(cmd_root, '...')))
+        print('')
+
+    def to_json(self):
+        """Return the spans as a json serializable dict."""
+        return {'start': self.start, 'spans': self.spans}
+
+    def to_trace(self):
+        """
+        Return the spans as a Chrome trace (also read by speedscope).
+
+        Every lane is a thread of a single process, the main lane first,
+        and span times are in microseconds since the start of the run.
+        """
+        lanes = [self.lane]
+        for span in self.spans:
+            if span['lane'] not in lanes:
+                lanes.append(span['lane'])
+
+        events = []
+        for tid, lane in enumerate(lanes, 1):
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1,
+                           'tid': tid, 'args': {'name': lane}})
+            events.append({'name': 'thread_sort_index', 'ph': 'M', 'pid': 1,
+                           'tid': tid, 'args': {'sort_index': tid}})
+
+        for span in sorted(self.spans, key=lambda span: span['start']):
+            events.append({
+                'name': span['name'],
+                'cat': span['category'],
+                'ph': 'X',
+                'ts': int(1e6 * (span['start'] - self.start)),
+                'dur': int(1e6 * span['duration']),
+                'pid': 1,
+                'tid': lanes.index(span['lane']) + 1,
+                'args': span['args'],
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+@contextmanager
+def timed(timings, name, category='phase', **args):
+    """Time the enclosed block on timings, if any."""
+    if timings is None:
+        yield
+    else:
+        with timings.span(name, category, **args):
+            yield
+
+
 class ShortOutput(object):
     """Context manager for capturing and formating stdout and stderr."""
 
@@ -87,78 +226,513 @@ class ShortOutput(object):
                 print(line)
 
 
+class ProcessError(Exception):
+    """A process was killed (timed out or cancelled) or crashed."""
+
+    pass
+
+
+class ProcessRunner(object):
+    """
+    Single entry point for all external processes started by ciocheck.
+
+    Limits the number of concurrently running short lived processes, kills
+    processes running longer than the timeout and can cancel every process
+    it started (e.g. on KeyboardInterrupt). Long lived worker processes are
+    started with `popen` and only tracked for cancellation.
+    """
+
+    def __init__(self, max_processes=None, timeout=None):
+        """Single entry point for all external processes started."""
+        self._lock = threading.Lock()
+        self._processes = set()
+        self.max_processes = None
+        self.timeout = None
+        self._slots = None
+        self.cancelled = False
+        self.timings = None  # Timings of the short lived processes
+        self.configure(max_processes=max_processes, timeout=timeout)
+
+    def configure(self, max_processes=None, timeout=None):
+        """Set the concurrency limit and the default timeout in seconds."""
+        self.max_processes = max_processes or cpu_count()
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_processes)
+
+    def popen(self, args, **kwargs):
+        """Start a process tracked for cancellation."""
+        if self.cancelled:
+            raise RuntimeError('Process runner was cancelled')
+        process = subprocess.Popen(args, **kwargs)
+        with self._lock:
+            self._processes.add(process)
+        return process
+
+    def release(self, process):
+        """Stop tracking a finished process."""
+        with self._lock:
+            self._processes.discard(process)
+
+    @contextmanager
+    def process(self, args, timeout=None, **kwargs):
+        """Start a process once a slot is free and kill it after timeout."""
+        timeout = timeout or self.timeout
+        with self._slots:
+            start = time.time()
+            process = self.popen(args, **kwargs)
+            timer = None
+            if timeout:
+                timer = threading.Timer(timeout, self.kill, args=(process, ))
+                timer.daemon = True
+                timer.start()
+            try:
+                yield process
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                self.release(process)
+                self._add_span(args, process, start)
+
+    def _add_span(self, args, process, start):
+        """Time a finished process on its own lane."""
+        if self.timings is not None:
+            name = os.path.basename(args[0])
+            lane = '{0} {1}'.format(name, process.pid)
+            self.timings.add(name, 'process', start, time.time() - start,
+                             lane=lane, args={'arguments': len(args) - 1})
+
+    def kill(self, process, reason='Timed out'):
+        """Kill a process if it is still running."""
+        if process.poll() is None:
+            args = getattr(process, 'args', process.pid)
+            print('{0}: {1}'.format(reason, args), file=sys.stderr)
+            process.killed_reason = reason
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+    @staticmethod
+    def check(process, args):
+        """Raise ProcessError if a finished process was killed or crashed."""
+        reason = getattr(process, 'killed_reason', None)
+        returncode = process.returncode
+        if reason is None and returncode is not None and returncode < 0:
+            reason = 'Crashed with signal {0}'.format(-returncode)
+        if reason is not None:
+            raise ProcessError('{0}: {1}'.format(reason, args[0]))
+
+    def cancel(self):
+        """Kill all running processes and refuse to start new ones."""
+        self.cancelled = True
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            self.kill(process, reason='Cancelled')
+
+    def run(self, args, cwd=None, timeout=None):
+        """Run command and return decoded stdout and stderr."""
+        with self.process(
+                args,
+                timeout=timeout,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=cwd, ) as process:
+            output, error = process.communicate()
+
+        if isinstance(output, bytes):
+            output = output.decode()
+        if isinstance(error, bytes):
+            error = error.decode()
+
+        return output, error
+
+    def iter_lines(self, args, cwd=None, timeout=None, stderr=False):
+        """
+        Run command and yield output lines as soon as they are produced.
+
+        Lines are read from stdout, or from stderr if `stderr` is True, while
+        the other stream is drained in a thread so the process never blocks
+        on it. Raises ProcessError once the lines are consumed if the process
+        was killed or crashed, as its output is then incomplete.
+        """
+        with self.process(
+                args,
+                timeout=timeout,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=cwd, ) as process:
+            if stderr:
+                stream, other = process.stderr, process.stdout
+            else:
+                stream, other = process.stdout, process.stderr
+
+            drain = threading.Thread(target=other.read)
+            drain.daemon = True
+            drain.start()
+            try:
+                for line in iter(stream.readline, b''):
+                    yield line.decode()
+            finally:
+                stream.close()
+                drain.join()
+                process.wait()
+        self.check(process, args)
+
+
+class FileContents(object):
+    """
+    Contents of the checked files, read from disk only once per change.
+
+    Entries are validated against the file modification time, size and
+    inode, so a file changed by something else is read again, and files
+    written with `write` are kept without reading them back. Only the most
+    recently used `max_files` entries are kept.
+    """
+
+    def __init__(self, max_files=1024):
+        """Contents of the checked files, read from disk only once."""
+        self.max_files = max_files
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stat(path):
+        """Return the signature used to detect changes of path."""
+        stat = os.stat(path)
+        mtime = getattr(stat, 'st_mtime_ns', stat.st_mtime)
+        return (mtime, stat.st_size, stat.st_ino)
+
+    def _store(self, path, signature, data):
+        """Keep data of path, dropping the least recently used entries."""
+        with self._lock:
+            self._entries.pop(path, None)
+            self._entries[path] = (signature, data)
+            while len(self._entries) > self.max_files:
+                self._entries.popitem(last=False)
+
+    def read_bytes(self, path):
+        """Return the raw contents of path."""
+        path = os.path.abspath(path)
+        signature = self._stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        with open(path, 'rb') as file_obj:
+            data = file_obj.read()
+        self._store(path, signature, data)
+        return data
+
+    def read(self, path, encoding='utf-8', universal_newlines=True):
+        """Return the decoded contents of path."""
+        text = self.read_bytes(path).decode(encoding)
+        if universal_newlines:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return text
+
+    def lines(self, path, encoding='utf-8'):
+        """Return the decoded lines of path, keeping line endings."""
+        return self.read(path, encoding=encoding).splitlines(True)
+
+    def write(self, path, contents, encoding):
+        """Replace path with contents and keep them for the next reads."""
+        atomic_replace(path, contents, encoding)
+        path = os.path.abspath(path)
+        self._store(path, self._stat(path), contents.encode(encoding))
+
+    def clear(self):
+        """Forget all contents."""
+        with self._lock:
+            self._entries.clear()
+
+
 def run_command(args, cwd=None):
     """Run command."""
-    process = subprocess.Popen(
-        args,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        cwd=cwd, )
-    output, error = process.communicate()
+    return PROCESS_RUNNER.run(args, cwd=cwd)
+
+
+def iter_command(args, cwd=None, stderr=False):
+    """Run command and yield output lines as soon as they are produced."""
+    return PROCESS_RUNNER.iter_lines(args, cwd=cwd, stderr=stderr)
+
+
+def merge_iterators(iterators):
+    """
+    Consume iterators in threads and yield their items as they arrive.
+
+    The first exception raised by an iterator is raised again once all
+    iterators are exhausted.
+    """
+    items = queue.Queue()
+    done = object()
+    errors = []
+
+    def target(iterator):
+        try:
+            for item in iterator:
+                items.put(item)
+        except Exception as err:
+            errors.append(err)
+        finally:
+            items.put(done)
+
+    for iterator in iterators:
+        thread = threading.Thread(target=target, args=(iterator, ))
+        thread.daemon = True
+        thread.start()
+
+    pending = len(iterators)
+    while pending:
+        item = items.get()
+        if item is done:
+            pending -= 1
+        else:
+            yield item
+
+    if errors:
+        raise errors[0]
+
+
+def run_threads(tasks):
+    """
+    Run `(function, args)` tasks in threads and return results in order.
+
+    The first exception raised by a task is raised again once all tasks
+    finished.
+    """
+    results = [None] * len(tasks)
+    errors = []
+
+    def target(index, function, args):
+        try:
+            results[index] = function(*args)
+        except Exception as err:
+            errors.append(err)
+
+    threads = []
+    for index, (function, args) in enumerate(tasks):
+        thread = threading.Thread(target=target, args=(index, function, args))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
+
+
+def balanced_shards(paths, count):
+    """
+    Split paths in `count` shards of similar cost, using file size.
+
+    Files are assigned largest first to the currently cheapest shard. Paths
+    keep their relative order inside each shard.
+    """
+    sizes = {}
+    for path in paths:
+        try:
+            sizes[path] = os.path.getsize(path)
+        except OSError:
+            sizes[path] = 0
+
+    shards = [[] for _ in range(count)]
+    costs = [0] * count
+    for path in sorted(paths, key=lambda path: -sizes[path]):
+        index = costs.index(min(costs))
+        shards[index].append(path)
+        costs[index] += sizes[path]
+
+    order = dict((path, index) for index, path in enumerate(paths))
+    return [sorted(shard, key=order.get) for shard in shards if shard]
+
+
+def _scandir(path):
+    """Return `(folders, files)` names in path, symlinked folders excluded."""
+    folders, files = [], []
+    try:
+        if hasattr(os, 'scandir'):
+            for entry in os.scandir(path):
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        folders.append(entry.name)
+                else:
+                    files.append(entry.name)
+        else:
+            for name in os.listdir(path):
+                full_path = os.path.join(path, name)
+                if os.path.isdir(full_path):
+                    if not os.path.islink(full_path):
+                        folders.append(name)
+                else:
+                    files.append(name)
+    except OSError:
+        pass
+    return folders, files
+
+
+def iter_files(paths,
+               exts=(),
+               ignore_exts=DEFAULT_IGNORE_EXTENSIONS,
+               ignore_folders=DEFAULT_IGNORE_FOLDERS,
+               workers=None):
+    """
+    Yield all files matching the defined conditions, in no specific order.
+
+    Folders are scanned by `workers` threads (default to the cpu count)
+    taking subtrees from a shared queue, which mostly helps on network
+    mounted trees where listing a folder is slow.
+    """
+    ignore_folders = frozenset(ignore_folders)
+    ignore_suffixes = tuple('.' + ext for ext in ignore_exts)
+    suffixes = tuple('.' + ext for ext in exts)
+
+    def scan(root):
+        """Return accepted folders and files of root."""
+        folders, files = _scandir(root)
+        # Chop out hidden and ignored directories
+        folders = [os.path.join(root, folder) for folder in folders
+                   if folder[0] != '.' and folder not in ignore_folders]
+        # Chop out hidden files and filter extensions
+        files = [os.path.join(root, file) for file in files
+                 if file[0] != '.' and not file.endswith(ignore_suffixes)]
+        if suffixes:
+            files = [file for file in files if file.endswith(suffixes)]
+        return folders, files
+
+    roots = []
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+        else:
+            roots.append(path)
+
+    workers = workers or cpu_count()
+    if workers == 1:
+        while roots:
+            folders, files = scan(roots.pop())
+            roots += folders
+            for file in files:
+                yield file
+        return
+
+    folder_queue = queue.Queue()
+    file_queue = queue.Queue()
+    done = object()
+    lock = threading.Lock()
+    pending = [len(roots)]
+
+    def target():
+        while True:
+            root = folder_queue.get()
+            if root is done:
+                break
+            folders, files = scan(root)
+            with lock:
+                pending[0] += len(folders)
+            for folder in folders:
+                folder_queue.put(folder)
+            file_queue.put(files)
+            with lock:
+                pending[0] -= 1
+                finished = pending[0] == 0
+            if finished:
+                file_queue.put(done)
+
+    if not roots:
+        return
+
+    threads = []
+    for _ in range(workers):
+        thread = threading.Thread(target=target)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    for root in roots:
+        folder_queue.put(root)
+
+    try:
+        while True:
+            files = file_queue.get()
+            if files is done:
+                break
+            for file in files:
+                yield file
+    finally:
+        for _ in threads:
+            folder_queue.put(done)
 
-    if isinstance(output, bytes):
-        output = output.decode()
-    if isinstance(error, bytes):
-        error = error.decode()
 
-    return output, error
+def is_ignored(path,
+               ignore_exts=DEFAULT_IGNORE_EXTENSIONS,
+               ignore_folders=DEFAULT_IGNORE_FOLDERS):
+    """Return if relative `path` would be skipped when walking folders."""
+    parts = path.replace(os.sep, '/').split('/')
+    for folder in parts[:-1]:
+        if folder[0] == '.' and folder not in ('.', '..'):
+            return True
+        if folder in ignore_folders:
+            return True
+
+    file = parts[-1]
+    return file[0] == '.' or file.endswith(
+        tuple('.' + ext for ext in ignore_exts))
 
 
 def get_files(paths,
               exts=(),
               ignore_exts=DEFAULT_IGNORE_EXTENSIONS,
-              ignore_folders=DEFAULT_IGNORE_FOLDERS):
+              ignore_folders=DEFAULT_IGNORE_FOLDERS,
+              workers=None):
     """Return all files matching the defined conditions."""
-    all_files = []
-    for path in paths:
-        if os.path.isfile(path):
-            all_files.append(path)
-        else:
-            for root, folders, files in os.walk(path):
-                # Chop out hidden directories
-                new_folders = []
-                for folder in folders:
-                    if folder[0] != '.':
-                        tests = [
-                            folder != ignore_folder
-                            for ignore_folder in ignore_folders
-                        ]
-                        if all(tests):
-                            new_folders.append(folder)
-                folders[:] = new_folders
-
-                # Chop out hidden files and walk files
-                files = [f for f in files if f[0] != '.']
-                for file in files:
-                    tests, pass_tests = [True], [True]
-                    if ignore_exts:
-                        tests = [
-                            not file.endswith('.' + ext) for ext in ignore_exts
-                        ]
-                    if exts:
-                        pass_tests = [file.endswith('.' + ext) for ext in exts]
-
-                    if all(tests) and any(pass_tests):
-                        all_files.append(os.path.join(root, file))
-
-    return list(sorted(all_files))
+    return list(
+        sorted(
+            iter_files(
+                paths,
+                exts=exts,
+                ignore_exts=ignore_exts,
+                ignore_folders=ignore_folders,
+                workers=workers)))
 
 
 def filter_files(files, extensions):
-    """Filter files based on a list of extensions."""
-    copy_of_files = deepcopy(files)
-    for file in files:
-        if extensions:
-            tests = [file.endswith('.' + ext) for ext in extensions]
-        else:
-            tests = [True]
-
-        if not any(tests):
-            if isinstance(files, dict):
-                copy_of_files.pop(file)
-            else:
-                copy_of_files.remove(file)
-    return copy_of_files
+    """
+    Filter files based on a list of extensions.
+
+    Lists return a new list and dicts a new ordered dict, built in one pass.
+    Dict values (changed lines) are shared with the input, not copied.
+    """
+    if not extensions:
+        suffixes = None
+    else:
+        suffixes = tuple('.' + ext for ext in extensions)
+
+    if isinstance(files, dict):
+        return OrderedDict((file, lines) for file, lines in files.items()
+                           if suffixes is None or file.endswith(suffixes))
+    else:
+        return [file for file in files
+                if suffixes is None or file.endswith(suffixes)]
+
+
+def filter_paths(files, paths):
+    """
+    Filter files to those in paths, comparing absolute paths.
+
+    Like `filter_files`, lists return a new list and dicts a new ordered dict
+    sharing the changed lines of the input.
+    """
+    paths = set(os.path.abspath(path) for path in paths)
+    if isinstance(files, dict):
+        return OrderedDict((file, lines) for file, lines in files.items()
+                           if os.path.abspath(file) in paths)
+    else:
+        return [file for file in files if os.path.abspath(file) in paths]
 
 
 def _rename_over_existing(src, dest):
@@ -228,6 +802,10 @@ def make_sorted_dict(dic):
     return ordered_results
 
 
+PROCESS_RUNNER = ProcessRunner()
+FILE_CONTENTS = FileContents()
+
+
 def test():
     """Main local test."""
     paths = [os.path.dirname(os.path.realpath(__file__))]
@@ -8,13 +8,120 @@
 """Version control helpers. Find staged, commited, modified files/lines."""
 
 # Standard library imports
+from bisect import bisect_right
 import os
 import re
 
 # Local imports
 from ciocheck.config import (COMMITED_MODE, DEFAULT_BRANCH, STAGED_MODE,
                              UNSTAGED_MODE)
-from ciocheck.utils import get_files, make_sorted_dict, run_command
+from ciocheck.utils import get_files, is_ignored, make_sorted_dict, run_command
+
+
+class LineRanges(object):
+    """
+    Compact set of line numbers stored as sorted, merged closed intervals.
+
+    Membership tests are O(log n) on the number of intervals.
+    """
+
+    def __init__(self, ranges=()):
+        """Compact set of line numbers stored as sorted closed intervals."""
+        self._starts = []
+        self._ends = []
+        for start, end in sorted(ranges):
+            self.add(start, end)
+
+    def add(self, start, end):
+        """Add interval [start, end], must not start before the last one."""
+        if self._starts and start <= self._ends[-1] + 1:
+            self._ends[-1] = max(self._ends[-1], end)
+        else:
+            self._starts.append(start)
+            self._ends.append(end)
+
+    @property
+    def ranges(self):
+        """Return the list of (start, end) intervals."""
+        return list(zip(self._starts, self._ends))
+
+    def __contains__(self, line):
+        """Return if line is inside one of the intervals."""
+        index = bisect_right(self._starts, line) - 1
+        return index >= 0 and line <= self._ends[index]
+
+    def __iter__(self):
+        """Iterate over all line numbers."""
+        for start, end in zip(self._starts, self._ends):
+            for line in range(start, end + 1):
+                yield line
+
+    def __len__(self):
+        """Return the number of lines."""
+        return sum(end - start + 1
+                   for start, end in zip(self._starts, self._ends))
+
+    def __eq__(self, other):
+        """Compare intervals."""
+        return isinstance(other, LineRanges) and self.ranges == other.ranges
+
+    def __ne__(self, other):
+        """Compare intervals."""
+        return not self == other
+
+    def __repr__(self):
+        """Return the representation of the intervals."""
+        return 'LineRanges({0})'.format(self.ranges)
+
+
+class AllLines(object):
+    """Changed lines marker meaning that the whole file has changed."""
+
+    def __contains__(self, line):
+        """Return True for any valid line number of the file."""
+        return line > 0
+
+    def __repr__(self):
+        """Return the representation of the marker."""
+        return 'ALL_LINES'
+
+
+ALL_LINES = AllLines()
+
+
+# Escapes used by git in quoted paths, besides three digit octal bytes
+GIT_ESCAPES = {
+    'a': 7,
+    'b': 8,
+    't': 9,
+    'n': 10,
+    'v': 11,
+    'f': 12,
+    'r': 13,
+    '"': 34,
+    '\\': 92,
+}
+
+
+def unquote_git_path(path):
+    """Return a path quoted by git (C style) as plain text."""
+    if not path.startswith('"'):
+        return path
+
+    data = bytearray()
+    index, end = 1, len(path) - 1
+    while index < end:
+        char = path[index]
+        if char != '\\':
+            data.extend(char.encode('utf-8'))
+            index += 1
+        elif path[index + 1] in GIT_ESCAPES:
+            data.append(GIT_ESCAPES[path[index + 1]])
+            index += 2
+        else:
+            data.append(int(path[index + 1:index + 4], 8))
+            index += 4
+    return data.decode('utf-8')
 
 
 class DiffToolBase(object):
@@ -31,6 +138,14 @@ class DiffToolBase(object):
         """Return if it is a repo of the type."""
         raise NotImplementedError
 
+    def all_files(self):
+        """Return list of all files."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Forget cached diffs, so changes made since are picked up."""
+        pass
+
     def commited_files(self, branch=DEFAULT_BRANCH):
         """Return list of commited files."""
         raise NotImplementedError
@@ -73,6 +188,10 @@ class HgDiffTool(DiffToolBase):
         """Return if it is a repo of the type."""
         return False
 
+    def all_files(self):
+        """Return list of all files."""
+        return []
+
     def commited_files(self, branch=DEFAULT_BRANCH):
         """Return list of commited files."""
         return []
@@ -102,25 +221,31 @@ class GitDiffTool(DiffToolBase):
     """Thin wrapper for a subset of the `git diff` command."""
 
     # Regular expressions used to parse the diff output
-    SRC_FILE_RE = re.compile(r'^diff --git "?a/.*"? "?b/([^ \n"]*)"?')
-    MERGE_CONFLICT_RE = re.compile(r'^diff --cc ([^ \n]*)')
-    HUNK_LINE_RE = re.compile(r'\+([0-9]*)')
+    HUNK_RANGE_RE = re.compile(r'^([-+])([0-9]+)(?:,([0-9]+))?$')
 
     def __init__(self, path):
         """Thin wrapper for a subset of the `git diff` command."""
         self.path = path
         self._top_level = None
         self._is_repo = None
+        self._diffs = {}
 
-    def _git_run_helper(self,
-                        branch=DEFAULT_BRANCH,
-                        files_only=False,
-                        mode=None):
+    def clear(self):
+        """Forget cached diffs, so changes made since are picked up."""
+        self._diffs = {}
+
+    def _git_run_helper(self, branch=DEFAULT_BRANCH, mode=None):
         """Build git diff command to generate different types of diffs."""
+        # Paths are only quoted if they hold quotes, backslashes or control
+        # characters, and keep the a/ and b/ prefixes
         command = [
             'git',
             '-c',
+            'core.quotepath=off',
+            '-c',
             'diff.mnemonicprefix=no',
+            '-c',
+            'diff.noprefix=no',
             'diff',
         ]
 
@@ -130,25 +255,15 @@ class GitDiffTool(DiffToolBase):
             command.append('--cached')
 
         command += [
+            '-U0',  # Only hunk headers are parsed, so skip context lines
             '--no-color',
             '--no-ext-diff',
             '--diff-filter=AM',  # Means "added" and "modified"
         ]
 
-        if files_only:
-            command += [
-                '--name-only',
-                '-z',  # Means nul-separated names
-            ]
-
-            output, error = run_command(command, cwd=self.path)
+        result, error = run_command(command, cwd=self.path)
+        if error:
             print(error)
-            result = set(output.split('\x00'))
-            result.discard('')  # There's an empty line in git output
-            result = [os.path.join(self.top_level, i) for i in sorted(result)]
-            result = [i for i in result if i.startswith(self.path)]
-        else:
-            result, error = run_command(command, cwd=self.path)
 
         return result
 
@@ -158,8 +273,8 @@ class GitDiffTool(DiffToolBase):
 
         Dictionary in the form:
             { SRC_PATH: (ADDED_LINES, DELETED_LINES) }
-        where `ADDED_LINES` and `DELETED_LINES` are lists of line numbers
-        added/deleted respectively.
+        where `ADDED_LINES` and `DELETED_LINES` are `LineRanges` of line
+        numbers added/deleted respectively.
         """
         # Create a dict to hold results
         diff_dict = dict()
@@ -183,9 +298,6 @@ class GitDiffTool(DiffToolBase):
         # Keep track of the current source file
         src_path = None
 
-        # Signal that we've found a hunk (after starting a source file)
-        found_hunk = False
-
         # Parse the diff string into sections by source file
         for line in diff_str.split('\n'):
 
@@ -202,177 +314,127 @@ class GitDiffTool(DiffToolBase):
                 if src_path not in source_dict:
                     source_dict[src_path] = []
 
-                # Signal that we're waiting for a hunk for this source file
-                found_hunk = False
+            # Only hunk headers are stored for this source file, they hold
+            # all the information about changed lines
+            elif line.startswith('@@'):
 
-            # Every other line is stored in the dictionary for this source file
-            # once we find a hunk section
-            else:
+                if src_path is not None:
+                    source_dict[src_path].append(line)
 
-                # Only add lines if we're in a hunk section
-                # (ignore index and files changed lines)
-                if found_hunk or line.startswith('@@'):
-
-                    # Remember that we found a hunk
-                    found_hunk = True
-
-                    if src_path is not None:
-                        source_dict[src_path].append(line)
-
-                    else:
-                        # We tolerate other information before we have
-                        # a source file defined, unless it's a hunk line
-                        if line.startswith("@@"):
-                            msg = "Hunk has no source file: '{0}'".format(line)
-                            raise Exception(msg)
+                else:
+                    # We tolerate other information before we have
+                    # a source file defined, unless it's a hunk line
+                    msg = "Hunk has no source file: '{0}'".format(line)
+                    raise Exception(msg)
 
         return source_dict
 
     def _parse_source_line(self, line):
-        """Return path to source given a source line in `git diff`."""
-        if '--git' in line:
-            regex = self.SRC_FILE_RE
-        elif '--cc' in line:
-            regex = self.MERGE_CONFLICT_RE
+        """
+        Return path to source given a source line in `git diff`.
+
+        Added and modified files have the same old and new path, so in
+        `diff --git a/PATH b/PATH` the new path is the second half of the
+        line, even if PATH holds spaces. Either both paths are quoted or
+        none.
+        """
+        if line.startswith('diff --git '):
+            paths = line[len('diff --git '):]
+            path = unquote_git_path(paths[(len(paths) + 1) // 2:])
+            prefix = 'b/'
+        elif line.startswith('diff --cc '):
+            path = unquote_git_path(line[len('diff --cc '):])
+            prefix = ''
         else:
             msg = ("Do not recognize format of source in line "
                    "'{0}'".format(line))
             raise Exception(msg)
 
-        # Parse for the source file path
-        groups = regex.findall(line)
-
-        if len(groups) == 1:
-            return groups[0]
-
-        else:
+        if not path.startswith(prefix):
             msg = "Could not parse source path in line '{0}'".format(line)
             raise Exception(msg)
+        return path[len(prefix):]
 
-    def _parse_lines(self, diff_lines):
+    def _parse_lines(self, hunk_lines):
         """
         Return  `(ADDED_LINES, DELETED_LINES)` for a source file in diff.
 
-        `ADDED_LINES` and `DELETED_LINES` are lists of line numbers
-        added/deleted respectively.
+        `ADDED_LINES` and `DELETED_LINES` are `LineRanges` of line numbers
+        added/deleted respectively, built from the hunk headers only.
         """
-        added_lines = []
-        deleted_lines = []
-
-        current_line_new = None
-        current_line_old = None
-
-        for line in diff_lines:
-
-            # If this is the start of the hunk definition, retrieve
-            # the starting line number
-            if line.startswith('@@'):
-                line_num = self._parse_hunk_line(line)
-                current_line_new, current_line_old = line_num, line_num
-
-            # This is an added/modified line, so store the line number
-            elif line.startswith('+'):
-
-                # Since we parse for source file sections before
-                # calling this method, we're guaranteed to have a source
-                # file specified.  We check anyway just to be safe.
-                if current_line_new is not None:
-
-                    # Store the added line
-                    added_lines.append(current_line_new)
-
-                    # Increment the line number in the file
-                    current_line_new += 1
-
-            # This is a deleted line that does not exist in the final
-            # version, so skip it
-            elif line.startswith('-'):
-
-                # Since we parse for source file sections before
-                # calling this method, we're guaranteed to have a source
-                # file specified.  We check anyway just to be safe.
-                if current_line_old is not None:
+        added, deleted = [], []
 
-                    # Store the deleted line
-                    deleted_lines.append(current_line_old)
+        for line in hunk_lines:
+            (new_start, new_count), (old_start, old_count) = \
+                self._parse_hunk_line(line)
+            if new_count:
+                added.append((new_start, new_start + new_count - 1))
+            if old_count:
+                deleted.append((old_start, old_start + old_count - 1))
 
-                    # Increment the line number in the file
-                    current_line_old += 1
-
-            # This is a line in the final version that was not modified.
-            # Increment the line number, but do not store this as a changed
-            # line.
-            else:
-                if current_line_old is not None:
-                    current_line_old += 1
-
-                if current_line_new is not None:
-                    current_line_new += 1
-
-                # If we are not in a hunk, then ignore the line
-                else:
-                    pass
-
-        return added_lines, deleted_lines
+        return LineRanges(added), LineRanges(deleted)
 
     def _parse_hunk_line(self, line):
         """
-        Return the line number at the start of a hunk in a given line.
+        Return the new and old `(start, count)` of a hunk in a given line.
 
         A hunk is a segment of code that contains changes.
 
         The format of the hunk line is:
             @@ -k,l +n,m @@ TEXT
         where `k,l` represent the start line and length before the changes
-        and `n,m` represent the start line and length after the changes.
+        and `n,m` represent the start line and length after the changes. The
+        length is omitted when it is 1. Merge conflicts use a combined
+        format with one `-k,l` range per parent, only the first is used.
         `git diff` will sometimes put a code excerpt from within the hunk
         in the `TEXT` section of the line.
         """
         # Split the line at the @@ terminators (start and end of the line)
-        components = line.split('@@')
+        marker = '@@@' if line.startswith('@@@') else '@@'
+        components = line.split(marker)
 
         # The first component should be an empty string, because
         # the line starts with '@@'.  The second component should
         # be the hunk information, and any additional components
         # are excerpts from the code.
-        if len(components) >= 2:
-
-            hunk_info = components[1]
-            groups = self.HUNK_LINE_RE.findall(hunk_info)
-
-            if len(groups) == 1:
-
-                try:
-                    return int(groups[0])
-
-                except ValueError:
-                    msg = ("Could not parse '{0}' as a line "
-                           "number".format(groups[0]))
-                    raise Exception(msg)
-
-            else:
-                msg = "Could not find start of hunk in line '{0}'".format(line)
-                raise Exception(msg)
-
-        else:
+        if len(components) < 3:
             msg = "Could not parse hunk in line '{0}'".format(line)
             raise Exception(msg)
 
-    def _diff_committed(self, branch='origin/master'):
-        """Return changes for committed files."""
-        result = self._git_run_helper(
-            branch=branch, files_only=False, mode=COMMITED_MODE)
-        return result
+        new_range, old_range = None, None
+        for info in components[1].split():
+            match = self.HUNK_RANGE_RE.match(info)
+            if match is None:
+                continue
+            sign, start, count = match.groups()
+            start_count = (int(start), 1 if count is None else int(count))
+            if sign == '+':
+                new_range = start_count
+            elif old_range is None:
+                old_range = start_count
+
+        if new_range is None or old_range is None:
+            msg = "Could not find start of hunk in line '{0}'".format(line)
+            raise Exception(msg)
 
-    def _diff_staged(self):
-        """Return diff for staged changes."""
-        result = self._git_run_helper(files_only=False, mode=STAGED_MODE)
-        return result
+        return new_range, old_range
 
-    def _diff_unstaged(self):
-        """Return diff for unstaged changes."""
-        result = self._git_run_helper(files_only=False, mode=UNSTAGED_MODE)
-        return result
+    def _diff(self, mode, branch=DEFAULT_BRANCH):
+        """
+        Return the parsed diff for `mode`.
+
+        `git diff` runs only once per mode (and branch), both file lists and
+        changed lines are derived from that snapshot.
+        """
+        cache_key = (mode, branch if mode == COMMITED_MODE else None)
+        if cache_key not in self._diffs:
+            diff_str = self._git_run_helper(branch=branch, mode=mode)
+            self._diffs[cache_key] = self._parse_diff_str(diff_str)
+        return self._diffs[cache_key]
+
+    def _diff_files(self, mode, branch=DEFAULT_BRANCH):
+        """Return files in the diff for `mode` located inside the path."""
+        return [i for i in self._diff(mode, branch) if i.startswith(self.path)]
 
     # --- Public API
     # -------------------------------------------------------------------------
@@ -402,36 +464,67 @@ class GitDiffTool(DiffToolBase):
                 self._top_level = output.split('\n')[0]
         return self._top_level
 
+    def all_files(self):
+        """
+        Return list of files tracked or untracked (not ignored) in the path.
+
+        Files ignored by git are never visited, files deleted from the
+        working tree and submodules are skipped.
+        """
+        command = ['git', 'ls-files', '-z', '--full-name', '-t', '--stage',
+                   '--cached', '--deleted', '--others', '--exclude-standard']
+        output, error = run_command(command, cwd=self.path)
+        if error:
+            print(error)
+
+        names, deleted = set(), set()
+        for item in output.split('\x00'):
+            if not item:
+                continue
+            tag, info = item.split(' ', 1)
+            if tag == '?':
+                # Untracked, nested repositories are listed as folders
+                if not info.endswith('/'):
+                    names.add(info)
+                continue
+
+            info, name = info.split('\t', 1)
+            if tag == 'R':
+                deleted.add(name)
+            elif not info.startswith('160000'):
+                # Submodules (gitlinks) are folders, not files
+                names.add(name)
+
+        result = []
+        for name in sorted(names - deleted):
+            path = os.path.join(self.top_level, name)
+            if not is_ignored(os.path.relpath(path, self.path)):
+                result.append(path)
+        return result
+
     def commited_files(self, branch=DEFAULT_BRANCH):
         """Return list of commited files."""
-        result = self._git_run_helper(
-            branch=branch, files_only=True, mode=COMMITED_MODE)
-        return result
+        return self._diff_files(COMMITED_MODE, branch=branch)
 
     def staged_files(self):
         """Return list of staged files."""
-        result = self._git_run_helper(files_only=True, mode=STAGED_MODE)
-        return result
+        return self._diff_files(STAGED_MODE)
 
     def unstaged_files(self):
         """Return list of unstaged files."""
-        result = self._git_run_helper(files_only=True, mode=UNSTAGED_MODE)
-        return result
+        return self._diff_files(UNSTAGED_MODE)
 
     def commited_file_lines(self, branch=DEFAULT_BRANCH):
         """Return commited files and lines modified."""
-        result = self._parse_diff_str(self._diff_committed(branch=branch))
-        return result
+        return self._diff(COMMITED_MODE, branch=branch)
 
     def staged_file_lines(self):
         """Return unstaged files and lines modified."""
-        result = self._parse_diff_str(self._diff_staged())
-        return result
+        return self._diff(STAGED_MODE)
 
     def unstaged_file_lines(self):
         """Return staged files and lines modified."""
-        result = self._parse_diff_str(self._diff_unstaged())
-        return result
+        return self._diff(UNSTAGED_MODE)
 
 
 class NoDiffTool(DiffToolBase):
@@ -446,9 +539,7 @@ class NoDiffTool(DiffToolBase):
         if lines:
             paths_dic = {}
             for path in paths:
-                paths_dic[path] = (
-                    [-1],
-                    range(100000), )
+                paths_dic[path] = (ALL_LINES, LineRanges())
             results = paths_dic
         else:
             results = paths
@@ -465,6 +556,10 @@ class NoDiffTool(DiffToolBase):
         """Return always True as this handles folders not under VC."""
         return True
 
+    def all_files(self):
+        """Return list of all files."""
+        return self._get_files_helper()
+
     def commited_files(self, branch=DEFAULT_BRANCH):
         """Return list of commited files."""
         return self._get_files_helper()
@@ -503,17 +598,31 @@ class DiffTool(object):
         """Generic diff tool for handling mercurial, git and no vcs folders."""
         self.paths = paths
         self.diff_tools = {}
+        self.path_tools = {}
 
         for path in self.paths:
             for diff_tool in self.TOOLS:
                 tool = diff_tool(path)
                 if tool.is_repo():
+                    self.path_tools[path] = tool
                     if tool.top_level not in self.diff_tools:
                         self.diff_tools[tool.top_level] = tool
                     break
 
     # --- Public API
     # -------------------------------------------------------------------------
+    def clear(self):
+        """Forget cached diffs, so changes made since are picked up."""
+        for path_tool in self.path_tools.values():
+            path_tool.clear()
+
+    def all_files(self):
+        """Return list of all files, using the vcs index when available."""
+        results = set()
+        for path_tool in self.path_tools.values():
+            results.update(path_tool.all_files())
+        return list(sorted(results))
+
     def commited_files(self, branch=DEFAULT_BRANCH):
         """Return list of commited files."""
         results = []
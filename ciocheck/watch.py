@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# Licensed under the terms of the MIT License
+# (see LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""File watchers used by the `--watch` mode."""
+
+from __future__ import absolute_import, print_function
+
+# Standard library imports
+import os
+import time
+
+# Local imports
+from ciocheck.utils import get_files, is_ignored, iter_files
+
+
+class PollingWatcher(object):
+    """Detect changed files by polling their modification time and size."""
+
+    def __init__(self, paths, interval=0.5):
+        """Detect changed files by polling their modification time and size."""
+        self.paths = paths
+        self.interval = interval
+        self._snapshot = {}
+
+    def _take_snapshot(self):
+        """Return the stat signature of every file in paths."""
+        snapshot = {}
+        for path in iter_files(self.paths):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+    def reset(self):
+        """Forget previous changes, e.g. those made by formatters."""
+        self._snapshot = self._take_snapshot()
+
+    def wait(self):
+        """Block until some files change and return them sorted."""
+        while True:
+            time.sleep(self.interval)
+            snapshot = self._take_snapshot()
+            changed = [path for path, signature in snapshot.items()
+                       if self._snapshot.get(path) != signature]
+            self._snapshot = snapshot
+            if changed:
+                return list(sorted(changed))
+
+    def close(self):
+        """Stop watching."""
+        pass
+
+
+class InotifyWatcher(object):
+    """Detect changed files with inotify (requires `inotify_simple`)."""
+
+    def __init__(self, paths, delay=50):
+        """Detect changed files with inotify (requires `inotify_simple`)."""
+        from inotify_simple import INotify, flags
+
+        self.paths = paths
+        self.delay = delay  # Milliseconds to wait for grouping events
+        self._flags = flags
+        self._mask = (flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+        self._inotify = INotify()
+        self._folders = {}
+        self._files = set(path for path in paths if os.path.isfile(path))
+        self._roots = [path for path in paths if path not in self._files]
+        for path in self._roots:
+            self._add_folder(path)
+        for path in self._files:
+            watch = self._inotify.add_watch(os.path.dirname(path), self._mask)
+            self._folders[watch] = os.path.dirname(path)
+
+    def _is_watched(self, path):
+        """Return if path is one of the watched files or folders."""
+        return path in self._files or any(
+            path.startswith(os.path.join(root, '')) for root in self._roots)
+
+    def _add_folder(self, path):
+        """Watch a folder and its subfolders not skipped when walking."""
+        for root, folders, _ in os.walk(path):
+            folders[:] = [folder for folder in folders
+                          if not is_ignored(os.path.join(folder, '_'))]
+            watch = self._inotify.add_watch(root, self._mask)
+            self._folders[watch] = root
+
+    def reset(self):
+        """Forget previous changes, e.g. those made by formatters."""
+        while self._inotify.read(timeout=0):
+            pass
+
+    def wait(self):
+        """Block until some files change and return them sorted."""
+        while True:
+            changed = set()
+            for event in self._inotify.read(read_delay=self.delay):
+                root = self._folders.get(event.wd)
+                if root is None or not event.name:
+                    continue
+                path = os.path.join(root, event.name)
+                if event.mask & self._flags.ISDIR:
+                    if not is_ignored(os.path.join(event.name, '_')):
+                        self._add_folder(path)
+                        changed.update(get_files([path]))
+                elif not is_ignored(event.name) and self._is_watched(path):
+                    changed.add(path)
+            if changed:
+                return list(sorted(changed))
+
+    def close(self):
+        """Stop watching."""
+        self._inotify.close()
+
+
+def get_watcher(paths):
+    """Return an inotify watcher if available, else a polling watcher."""
+    try:
+        return InotifyWatcher(paths)
+    except (ImportError, OSError):
+        return PollingWatcher(paths)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright (c) 2016 Continuum Analytics, Inc.
+#
+# Licensed under the terms of the MIT License
+# (see LICENSE.txt for details)
+# -----------------------------------------------------------------------------
+"""Pool of long lived worker processes running `format_task.py`."""
+
+from __future__ import absolute_import, print_function
+
+# Standard library imports
+import json
+import os
+import subprocess
+import sys
+import threading
+
+# Third party imports
+from six.moves import queue
+
+# Local imports
+from ciocheck.utils import PROCESS_RUNNER, cpu_count
+
+HERE = os.path.dirname(os.path.realpath(__file__))
+
+
+class WorkerPool(object):
+    """
+    Pool of warm worker processes fed from a shared task queue.
+
+    Each worker is a `format_task.py --worker` interpreter that imports the
+    formatters once and then handles one json encoded task per line read
+    from stdin, answering with one json encoded result (and the timings of
+    the task) per line on stdout.
+    Workers run in `cmd_root`, so in process linters find their config.
+    """
+
+    def __init__(self, cmd_root, check, workers=None, cache=False):
+        """Pool of warm worker processes fed from a shared task queue."""
+        self.cmd_root = cmd_root
+        self.check = check
+        self.cache = cache
+        self.workers = workers or cpu_count()
+        self.processes = []
+        self._lock = threading.Lock()  # Linters may share the pool
+        self.timings = None  # Timings (ciocheck.utils) of the worker tasks
+
+    def _start_worker(self):
+        """Start a new worker process."""
+        cmd = [sys.executable, os.path.join(HERE, 'format_task.py'),
+               '--worker']
+        env = os.environ.copy()
+        env['CIOCHECK_PROJECT_ROOT'] = self.cmd_root
+        env['CIOCHECK_CHECK'] = str(self.check)
+        if self.cache:
+            env['CIOCHECK_CACHE'] = '1'
+        proc = PROCESS_RUNNER.popen(
+            cmd,
+            cwd=self.cmd_root,
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            universal_newlines=True)
+        return proc
+
+    def _serve(self, proc, tasks, results, errors):
+        """Feed tasks from the shared queue to a worker until it is empty."""
+        while True:
+            try:
+                index, task = tasks.get_nowait()
+            except queue.Empty:
+                break
+
+            # A hung formatter would block readline forever
+            timer = None
+            if PROCESS_RUNNER.timeout:
+                timer = threading.Timer(
+                    PROCESS_RUNNER.timeout, PROCESS_RUNNER.kill, args=(proc, ))
+                timer.daemon = True
+                timer.start()
+            try:
+                proc.stdin.write(json.dumps(task) + '\n')
+                proc.stdin.flush()
+                line = proc.stdout.readline()
+            except (IOError, OSError):
+                line = ''
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+            if not line:
+                reason = getattr(proc, 'killed_reason', None) or 'Crashed'
+                errors.append('Worker {0} on task: {1}'.format(
+                    reason.lower(), task))
+                self.processes.remove(proc)
+                PROCESS_RUNNER.release(proc)
+                proc.wait()
+                if PROCESS_RUNNER.cancelled:
+                    break
+                # Replace the worker, so the pool keeps its size
+                proc = self._start_worker()
+                self.processes.append(proc)
+                continue
+
+            answer = json.loads(line)
+            results[index] = answer['result']
+            if self.timings is not None:
+                self.timings.extend(answer['timings'])
+
+    def start(self, amount=None):
+        """Start workers until `amount` (default to pool size) are alive."""
+        amount = min(amount or self.workers, self.workers)
+        while len(self.processes) < amount:
+            self.processes.append(self._start_worker())
+
+    def map(self, tasks):
+        """Run tasks on the pool and return results in the same order."""
+        with self._lock:
+            return self._map(tasks)
+
+    def _map(self, tasks):
+        """Run tasks on the pool, one feeding thread per worker."""
+        results = [None] * len(tasks)
+        if not tasks:
+            return results
+
+        self.start(len(tasks))
+        task_queue = queue.Queue()
+        for index, task in enumerate(tasks):
+            task_queue.put((index, task))
+
+        errors = []
+        threads = []
+        for proc in list(self.processes):
+            thread = threading.Thread(
+                target=self._serve,
+                args=(proc, task_queue, results, errors))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        for error in errors:
+            print(error)
+
+        return results
+
+    def close(self):
+        """Stop all worker processes."""
+        while self.processes:
+            proc = self.processes.pop(0)
+            try:
+                proc.stdin.close()
+            except (IOError, OSError):
+                pass
+            proc.wait()
+            PROCESS_RUNNER.release(proc)
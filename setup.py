@@ -60,7 +60,8 @@ setup(
     ],
     entry_points={
         'gui_scripts': [
-            'ciocheck = ciocheck.main:main'
+            'ciocheck = ciocheck.main:main',
+            'ciocheck-client = ciocheck.daemon:client_main',
         ]
     },
     include_package_data=True, )